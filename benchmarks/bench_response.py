@@ -0,0 +1,60 @@
+"""Throughput of ``Result`` serializers for large ``data`` payloads.
+
+Usage::
+
+    python benchmarks/bench_response.py [rows ...]
+"""
+import datetime
+import decimal
+import sys
+import timeit
+
+from flask import Flask
+
+from hobbit_core.response import JSON_SERIALIZERS, SuccessResult
+
+
+def gen_rows(count):
+    created_at = datetime.datetime(2024, 1, 1, 8, 0, 0)
+    return [{
+        'id': i,
+        'username': f'user{i}',
+        'email': f'user{i}@example.com',
+        'nickname': '用户',
+        'score': 98.5,
+        'balance': decimal.Decimal('10.25'),
+        'is_active': True,
+        'tags': ['a', 'b', 'c'],
+        'created_at': created_at.strftime('%Y-%m-%d %H:%M:%S'),
+    } for i in range(count)]
+
+
+def bench(app, rows, repeat=5):
+    data = gen_rows(rows)
+    results = {}
+    for name in JSON_SERIALIZERS:
+        app.config['HOBBIT_JSON_SERIALIZER'] = name
+        number = max(1, 20000 // rows)
+        seconds = min(timeit.repeat(
+            lambda: SuccessResult(data=data), number=number,
+            repeat=repeat)) / number
+        results[name] = (seconds, len(SuccessResult(data=data).data))
+    return results
+
+
+def main(sizes):
+    app = Flask(__name__)
+    with app.app_context():
+        print(f'{"rows":>8} {"serializer":>10} {"ms/resp":>10} '
+              f'{"resp/s":>10} {"bytes":>10} {"vs flask":>9}')
+        for rows in sizes:
+            results = bench(app, rows)
+            baseline = results['flask'][0]
+            for name, (seconds, size) in results.items():
+                print(f'{rows:>8} {name:>10} {seconds * 1000:>10.3f} '
+                      f'{1 / seconds:>10.1f} {size:>10} '
+                      f'{baseline / seconds:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main([int(i) for i in sys.argv[1:]] or [100, 1000, 10000])
@@ -0,0 +1,123 @@
+"""Items/sec of ``ModelSchema`` dump, stock marshmallow against
+``Meta.compiled``, and of query + dump, ORM instances against
+``dump_rows`` of column-projected rows.
+
+Usage::
+
+    python benchmarks/bench_schemas.py [items ...]
+"""
+import datetime
+import sys
+import timeit
+import tracemalloc
+
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import select
+from marshmallow_enum import EnumField
+
+from hobbit_core import HobbitManager
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+db = SQLAlchemy(app)
+HobbitManager(app, db)
+
+with app.app_context():
+    from hobbit_core.db import BaseModel, Column, EnumExt
+    from hobbit_core.schemas import ModelSchema
+
+    class RoleEnum(EnumExt):
+        admin = (1, '管理员')
+        normal = (2, '普通用户')
+
+    class BenchUser(BaseModel):
+        username = Column(db.String(50), nullable=False)
+        email = Column(db.String(50), nullable=False)
+        nickname = Column(db.String(50))
+        score = Column(db.Float)
+        is_active = Column(db.Boolean)
+        role = Column(db.Enum(RoleEnum))
+
+    def gen_schema(compiled):
+        class UserSchema(ModelSchema):
+            role = EnumField(RoleEnum)
+
+            class Meta:
+                model = BenchUser
+
+        UserSchema.Meta.compiled = compiled
+        return UserSchema(many=True)
+
+
+def gen_users(count):
+    created_at = datetime.datetime(2024, 1, 1, 8, 0, 0)
+    return [BenchUser(
+        id=i, username=f'user{i}', email=f'user{i}@example.com',
+        nickname='用户', score=98.5, is_active=True, role=RoleEnum.admin,
+        created_at=created_at, updated_at=created_at,
+    ) for i in range(count)]
+
+
+def bench_query(items, repeat=5):
+    schema = gen_schema(True)
+    db.session.query(BenchUser).delete()
+    db.session.add_all(gen_users(items))
+    db.session.commit()
+    db.session.expunge_all()
+    statement = select(*schema.row_columns()).order_by(BenchUser.id)
+
+    def orm():
+        ret = schema.dump(
+            db.session.query(BenchUser).order_by(BenchUser.id).all())
+        db.session.expunge_all()
+        return ret
+
+    def rows():
+        return schema.dump_rows(db.session.execute(statement).all())
+
+    assert orm() == rows()
+    number = max(1, 2000 // items)
+    results = {}
+    for name, func in (('orm', orm), ('rows', rows)):
+        seconds = min(timeit.repeat(
+            func, number=number, repeat=repeat)) / number
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results[name] = (seconds, peak)
+    return results
+
+
+def main(sizes, repeat=5):
+    schemas = {'stock': gen_schema(False), 'compiled': gen_schema(True)}
+    print(f'{"items":>8} {"mode":>10} {"ms/dump":>10} '
+          f'{"items/s":>12} {"vs stock":>9}')
+    for items in sizes:
+        users = gen_users(items)
+        assert schemas['stock'].dump(users) == \
+            schemas['compiled'].dump(users)
+        number = max(1, 20000 // items)
+        results = {}
+        for name, schema in schemas.items():
+            results[name] = min(timeit.repeat(
+                lambda: schema.dump(users), number=number,
+                repeat=repeat)) / number
+        for name, seconds in results.items():
+            print(f'{items:>8} {name:>10} {seconds * 1000:>10.3f} '
+                  f'{items / seconds:>12.0f} '
+                  f'{results["stock"] / seconds:>8.1f}x')
+
+    print(f'\n{"items":>8} {"query":>10} {"ms/query":>10} '
+          f'{"items/s":>12} {"peak KiB":>10}')
+    with app.app_context():
+        db.create_all()
+        for items in sizes:
+            for name, (seconds, peak) in bench_query(items).items():
+                print(f'{items:>8} {name:>10} {seconds * 1000:>10.3f} '
+                      f'{items / seconds:>12.0f} {peak / 1024:>10.0f}')
+
+
+if __name__ == '__main__':
+    main([int(i) for i in sys.argv[1:]] or [100, 1000, 10000])
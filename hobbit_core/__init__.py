@@ -37,6 +37,10 @@ class HobbitManager:
         self.db = db
 
         app.config.setdefault('HOBBIT_UPPER_SEQUENCE_NAME', False)
+        app.config.setdefault('HOBBIT_JSON_SERIALIZER', 'auto')
+
+        from .response import reload_response_settings
+        reload_response_settings(app)
 
         # Bind hobbit-core to app
         app.hobbit_manager = self
@@ -1,12 +1,15 @@
 from enum import Enum, EnumMeta
 from functools import wraps
+import hashlib
+import json
 import warnings
 
 from mypy_extensions import TypedDict
-from typing import Any, Union, List, Dict
+from typing import Any, Union, List, Dict, Optional, Tuple
 
 from flask import current_app
-from sqlalchemy import BigInteger, Column, ForeignKey, func, DateTime, Sequence
+from sqlalchemy import BigInteger, Column, ForeignKey, func, DateTime, \
+    Integer, Sequence
 from sqlalchemy.orm.session import Session
 from flask_sqlalchemy.model import DefaultMeta
 
@@ -63,7 +66,9 @@ class BaseModelMeta(DefaultMeta):
 
         primary_key_name = attrs.get('primary_key_name') or 'id'
 
-        attrs[primary_key_name] = Column(BigInteger, primary_key=True)
+        # SQLite only autoincrement INTEGER PRIMARY KEY
+        attrs[primary_key_name] = Column(
+            BigInteger().with_variant(Integer, 'sqlite'), primary_key=True)
         attrs['created_at'] = Column(
             DateTime, index=True, nullable=False, server_default=func.now())
         attrs['updated_at'] = Column(
@@ -177,13 +182,69 @@ def reference_col(tablename: str, nullable: bool = False, pk_name: str = 'id',
         nullable=nullable, **kwargs)
 
 
+class EnumRegistry(dict):
+    """All ``EnumExt`` subclasses by ``module.qualname``, filled by
+    ``EnumExtMeta`` when class created.
+
+    Examples::
+
+        from hobbit_core.db import enum_registry
+
+        enum_registry.options('app.models.consts')
+        # {'TaskState': [{'key': 0, 'label': 'CREATED', 'value': '新建'}]}
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.version = 0
+        self._encoded: Dict[Any, Tuple[bytes, str]] = {}
+
+    def register(self, enum: 'EnumExtMeta') -> None:
+        self[f'{enum.__module__}.{enum.__qualname__}'] = enum
+        self.version += 1
+        self._encoded.clear()
+
+    def options(self, module: Optional[str] = None,
+                verbose: bool = True) -> Dict[str, List[Dict[str, Any]]]:
+        """Options of registered enums, keyed by class name.
+
+        Args:
+            module (str): Only enums defined in this module or it's
+                submodules, example: ``'app.models.consts'``.
+            verbose (bool): See ``EnumExt.to_opts``.
+        """
+        return {
+            enum.__name__: enum.to_opts(verbose=verbose)  # type: ignore
+            for enum in self.values()
+            if module is None or enum.__module__ == module or
+            enum.__module__.startswith(f'{module}.')
+        }
+
+    def encoded_options(self, module: Optional[str] = None) \
+            -> Tuple[bytes, str]:
+        """Serialized ``options(module, verbose=True)`` and it's ETag, built
+        once until a new enum registered.
+        """
+        if module not in self._encoded:
+            payload = json.dumps(
+                self.options(module), sort_keys=True,
+                separators=(',', ':')).encode()
+            self._encoded[module] = (
+                payload, hashlib.sha1(payload).hexdigest())
+        return self._encoded[module]
+
+
+enum_registry = EnumRegistry()
+
+
 class EnumExtMeta(EnumMeta):
 
     def __new__(cls, name, bases, attrs):
         obj = super(EnumExtMeta, cls).__new__(cls, name, bases, attrs)
 
-        keys, values = set(), set()
-        for _, member in obj.__members__.items():
+        # reverse lookup indexes, label by key and label by value
+        keys, values = {}, {}
+        for label, member in obj.__members__.items():
             member = member.value
             if not isinstance(member, tuple) or len(member) != 2:
                 raise TypeError(
@@ -192,8 +253,20 @@ class EnumExtMeta(EnumMeta):
             if key in keys or value in values:
                 raise ValueError(u'duplicate values found: `{}`, please check '
                                  u'key or value.'.format(member))
-            keys.add(key)
-            values.add(key)
+            keys[key] = label
+            values[value] = label
+
+        obj._key_labels = keys
+        obj._value_labels = values
+        obj._opts = {
+            verbose: [
+                dict({'key': elem.value[0], 'value': elem.value[1]},
+                     **({'label': elem.name} if verbose else {}))
+                for elem in obj]
+            for verbose in (False, True)
+        }
+        if keys:
+            enum_registry.register(obj)
 
         return obj
 
@@ -251,7 +324,8 @@ class EnumExt(Enum, metaclass=EnumExtMeta):
             raise ``KeyError``.
         """
 
-        ret = {'key': cls[label].value[0], 'value': cls[label].value[1]}
+        key, value = cls[label].value
+        ret = {'key': key, 'value': value}
         if verbose:
             ret.update({'label': label})
         return ret
@@ -273,10 +347,9 @@ class EnumExt(Enum, metaclass=EnumExtMeta):
         if val in cls.__members__:
             return val  # type: ignore
 
-        pos = 1 if isinstance(val, str) else 0
-        for elem in cls:
-            if elem.value[pos] == val:
-                return elem.name
+        if isinstance(val, str):
+            return cls._value_labels.get(val)  # type: ignore
+        return cls._key_labels.get(val)  # type: ignore
 
     @classmethod
     def to_opts(cls, verbose: bool = False) -> List[Dict[str, Any]]:
@@ -290,16 +363,11 @@ class EnumExt(Enum, metaclass=EnumExtMeta):
             [{'key': 0, 'label': 'CREATED', 'value': u'新建'}, ...]
 
         Returns:
-            list: List of dict which key is `key`, `value`, label.
+            list: List of dict which key is `key`, `value`, label. Options
+            are built once per verbose flag, copies of them are returned.
         """
 
-        opts = []
-        for elem in cls:
-            opt = {'key': elem.value[0], 'value': elem.value[1]}
-            if verbose:
-                opt.update({'label': elem.name})
-            opts.append(opt)
-        return opts
+        return [dict(opt) for opt in cls._opts[bool(verbose)]]  # type: ignore
 
 
 def transaction(session: Session, nested: bool = False):
@@ -1,4 +1,6 @@
+import functools
 import logging
+from typing import Callable, Dict, Type, Union
 
 from sqlalchemy.orm import exc as orm_exc
 
@@ -22,17 +24,52 @@ you can change it
             "detail": "id number field length must be 18",  # for debug
         }
 
+    Handler of an exception is looked up along its MRO, for each class:
+
+    * handlers registered by :meth:`register`.
+    * ``handler_{module}`` method, module is ``__module__`` of exception \
+        class with ``.`` replaced by ``_``, like \
+        ``handler_werkzeug_exceptions``.
+
+    falls back to ``handler_others``. Lookup result is cached per exception
+    type.
+
     Examples::
 
         app.register_error_handler(Exception, ErrHandler.handler)
     """
 
+    _registry: Dict[Type[BaseException], Union[str, Callable]] = {
+        AssertionError: 'handler_assertion_error',
+    }
+
+    @classmethod
+    def register(cls, *exc_types: Type[BaseException]):
+        """Decorator to register handler of ``exc_types`` and their
+        subclasses, registered on subclass of ErrHandler only works for it.
+
+        Examples::
+
+            @ErrHandler.register(PermissionError)
+            def handle_permission_error(e):
+                return ForbiddenResult(detail=repr(e))
+        """
+        def decorator(func):
+            if '_registry' not in cls.__dict__:
+                cls._registry = {}
+            for exc_type in exc_types:
+                cls._registry[exc_type] = func
+            _resolve_handler.cache_clear()
+            return func
+        return decorator
+
     @classmethod
     def handler_werkzeug_exceptions(cls, e):
+        message = RESP_MSGS.get(e.code, e.name)
+        if not hasattr(e, 'data'):  # canonical body, encoded once
+            return Result(Result.encode(e.code, message), status=e.code)
         return Result(gen_response(
-            e.code, RESP_MSGS.get(e.code, e.name),
-            None if not hasattr(e, 'data') else e.data['messages']),
-            status=e.code)
+            e.code, message, e.data['messages']), status=e.code)
 
     @classmethod
     def handler_sqlalchemy_exc(cls, e):
@@ -59,9 +96,19 @@ you can change it
 
     @classmethod
     def handler(cls, e):
-        exc = 'others'
-        if isinstance(e, AssertionError):
-            exc = 'assertion_error'
-        elif hasattr(e, '__module__'):
-            exc = e.__module__.replace('.', '_')
-        return getattr(cls, 'handler_{}'.format(exc), cls.handler_others)(e)
+        return _resolve_handler(cls, type(e))(e)
+
+
+@functools.lru_cache(maxsize=None)
+def _resolve_handler(err_handler, exc_type) -> Callable:
+    for klass in exc_type.__mro__:
+        for handler_cls in err_handler.__mro__:
+            func = handler_cls.__dict__.get('_registry', {}).get(klass)
+            if func is not None:
+                return getattr(err_handler, func) \
+                    if isinstance(func, str) else func
+
+        name = 'handler_{}'.format(klass.__module__.replace('.', '_'))
+        if hasattr(err_handler, name):
+            return getattr(err_handler, name)
+    return err_handler.handler_others
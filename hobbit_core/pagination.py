@@ -1,14 +1,30 @@
+import base64
+import datetime
+import decimal
+import enum
+import functools
+import json
+import logging
+import threading
+import time
+import weakref
+from collections import OrderedDict
 from mypy_extensions import TypedDict
-from typing import Union, List
+from typing import Any, Callable, Dict, Optional, Tuple, Type, Union, List
 
 from flask_sqlalchemy import model
+from sqlalchemy import and_, or_, case, false, text, inspect as sa_inspect
+from sqlalchemy.orm import load_only, selectinload
 
 from marshmallow import fields
 from marshmallow import validate
+from marshmallow import Schema, ValidationError
 from webargs.fields import DelimitedList
 
+from .err_handler import HobbitException
 from .utils import ParamsDict
 
+logger = logging.getLogger(__name__)
 
 #: Base params for list view func.
 PageParams = ParamsDict(
@@ -31,15 +47,305 @@ PageParams = ParamsDict(
 """
 
 
+#: Base params for cursor (keyset) paginated list view func.
+CursorParams = ParamsDict(
+    cursor=fields.Str(missing=None, required=False),
+    page_size=PageParams['page_size'],
+    order_by=PageParams['order_by'],
+)
+"""Base params for list view func which contains ``cursor``、``page_size``、\
+   ``order_by`` params, see :func:`cursor_pagination`.
+
+    Example::
+
+        @use_kwargs(CursorParams)
+        def list_users(cursor, page_size, order_by):
+            return cursor_pagination(User, cursor, page_size, order_by)
+"""
+
+
+@functools.lru_cache(maxsize=None)
+def get_order_by_map(obj: 'model.DefaultMeta') -> Dict[str, Any]:
+    """Sortable columns of model and their ordering expressions, built once
+    per model on first use::
+
+        {'id': User.id, '-id': User.id.desc(), ...}
+    """
+    order_map = {}
+    for column in obj.__table__.columns:
+        attr = getattr(obj, column.name, None)
+        if attr is None:
+            continue
+        order_map[column.name] = attr
+        order_map[f'-{column.name}'] = attr.desc()
+    return order_map
+
+
+class OrderBy(validate.Validator):
+    """Validator which checks ``order_by`` item is a sortable column of
+    model, the model is inspected lazily when first validated.
+    """
+
+    error = 'Column `{input}` not exist in {model}.'
+
+    def __init__(self, obj: 'model.DefaultMeta'):
+        self.obj = obj
+
+    def _repr_args(self) -> str:
+        return f'model={self.obj.__name__}'
+
+    def __call__(self, value: str) -> str:
+        if value not in get_order_by_map(self.obj):
+            raise ValidationError(self.error.format(
+                input=value, model=self.obj.__name__))
+        return value
+
+
+def model_page_params(obj: 'model.DefaultMeta',
+                      params: ParamsDict = PageParams) -> ParamsDict:
+    """Params whose ``order_by`` only accepts sortable columns of model, so
+    invalid columns are rejected when request loaded.
+
+    Example::
+
+        @use_kwargs(model_page_params(User))
+        def list_users(page, page_size, order_by):
+            return pagination(User, page, page_size, order_by)
+
+        @use_kwargs(model_page_params(User, CursorParams))
+        def list_users_by_cursor(cursor, page_size, order_by):
+            pass
+    """
+    return params.update({'order_by': DelimitedList(
+        fields.String(validate=OrderBy(obj)),
+        required=False, missing=params['order_by'].load_default)})
+
+
+#: Max depth of ``fields.Nested`` followed when projecting by schema.
+PROJECTION_MAX_DEPTH = 3
+
+#: Projections by schema class, then by ``(only, exclude, load_only)`` of
+#: schema instance (``None`` for schema class).
+_schema_projections = weakref.WeakKeyDictionary()
+
+
+def _get_schema_projection(schema, depth=0):
+    """``((attribute, nested projection), ...)`` dumped by schema, None if
+    schema may read any attribute (``fields.Method``、``fields.Function``).
+    """
+    projection = []
+    for name, field in schema.dump_fields.items():
+        if isinstance(field, (fields.Method, fields.Function)):
+            projection = None
+            break
+        attribute = (field.attribute or name).split('.')[0]
+        inner = field.inner if isinstance(field, fields.List) else field
+        nested = None
+        if isinstance(inner, fields.Nested) and \
+                depth < PROJECTION_MAX_DEPTH:
+            nested = _get_schema_projection(inner.schema, depth + 1)
+        projection.append((attribute, nested))
+    return projection if projection is None else tuple(projection)
+
+
+def _get_fields_projection(names):
+    """``['id', 'user', 'posts.title']`` to projection."""
+    projection = {}
+    for name in names:
+        attribute, _, rest = name.partition('.')
+        projection.setdefault(attribute, [])
+        if rest:
+            projection[attribute].append(rest)
+    return tuple(
+        (attribute, _get_fields_projection(rest) if rest else None)
+        for attribute, rest in projection.items())
+
+
+def get_projection(schema) -> Optional[Tuple]:
+    """Attributes (and nested attributes) to load for schema or field list.
+    ``PagedSchema`` is unwrapped to its ``items`` schema.
+    """
+    if isinstance(schema, (list, tuple)):
+        return _get_fields_projection(schema)
+    if isinstance(schema, type):
+        schema_class, key = schema, None
+    else:
+        schema_class, key = type(schema), (
+            None if schema.only is None else frozenset(schema.only),
+            frozenset(schema.exclude), frozenset(schema.load_only))
+
+    projections = _schema_projections.setdefault(schema_class, {})
+    if key not in projections:
+        if key is None:
+            schema = schema()
+        items = schema.dump_fields.get('items')
+        if isinstance(items, fields.Nested) and \
+                'page_size' in schema.dump_fields:
+            schema = items.schema
+        projections[key] = _get_schema_projection(schema)
+    return projections[key]
+
+
+def _loader_options(mapper, projection, required=(), loader=None):
+    if projection is None:  # all columns
+        return []
+
+    names = {name for name, _ in projection} | set(required)
+    names |= {c.key for c in mapper.primary_key}
+    relationships = [(mapper.relationships[name], nested)
+                     for name, nested in projection
+                     if name in mapper.relationships]
+    for relationship, _ in relationships:
+        names |= {mapper.get_property_by_column(c).key
+                  for c in relationship.local_columns}
+
+    options = []
+    # unknown attributes (property, hybrid) may read any column, load all
+    if all(n in mapper.column_attrs or n in mapper.relationships
+           for n in names):
+        columns = [mapper.column_attrs[n].class_attribute
+                   for n in sorted(names) if n in mapper.column_attrs]
+        options.append(
+            loader.load_only(*columns) if loader else load_only(*columns))
+
+    for relationship, nested in relationships:
+        attr = relationship.class_attribute
+        sub_loader = loader.selectinload(attr) if loader else \
+            selectinload(attr)
+        remote = [relationship.mapper.get_property_by_column(c).key
+                  for c in relationship.remote_side
+                  if c in relationship.mapper.columns.values()]
+        options.append(sub_loader)
+        options.extend(_loader_options(
+            relationship.mapper, nested, remote, sub_loader))
+    return options
+
+
+@functools.lru_cache(maxsize=256)
+def get_load_options(obj: 'model.DefaultMeta', projection: Optional[Tuple],
+                     required: Tuple[str, ...] = ()) -> tuple:
+    """``load_only`` for columns and ``selectinload`` for relationships of
+    projection, built once per (model, projection).
+    """
+    return tuple(_loader_options(sa_inspect(obj), projection, required))
+
+
 class PaginationType(TypedDict):
     items: list
     page: int
     page_size: int
-    total: int
+    total: Optional[int]
+    has_next: bool
+
+
+def _explain_sql(qexp, bind):
+    return str(qexp.statement.compile(
+        dialect=bind.dialect, compile_kwargs={'literal_binds': True}))
+
+
+def _estimate_postgresql(obj, qexp, bind):
+    sql = _explain_sql(qexp, bind)
+    plan = qexp.session.execute(
+        text(f'EXPLAIN (FORMAT JSON) {sql}'),
+        bind_arguments={'mapper': obj}).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def _estimate_mysql(obj, qexp, bind):
+    if qexp.statement.whereclause is None:
+        return qexp.session.execute(text(
+            'SELECT TABLE_ROWS FROM information_schema.TABLES '
+            'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :name'),
+            {'name': obj.__table__.name},
+            bind_arguments={'mapper': obj}).scalar()
+    row = qexp.session.execute(
+        text(f'EXPLAIN {_explain_sql(qexp, bind)}'),
+        bind_arguments={'mapper': obj}).mappings().first()
+    return int(row['rows'] * (row['filtered'] or 100) / 100)
+
+
+#: Row count estimators used by ``pagination(count='estimate')``, keyed by
+#: dialect name. An estimator is called with ``(model, query, bind)`` and
+#: returns estimated rows of query or None. Dialects not registered here
+#: fall back to exact count.
+COUNT_ESTIMATORS: Dict[str, Callable[..., Optional[int]]] = {
+    'postgresql': _estimate_postgresql,
+    'mysql': _estimate_mysql,
+}
+
+
+class _CountCache:
+    """Exact counts per normalized query (sql and params), expired by ttl.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def make_key(cls, qexp, bind):
+        compiled = qexp.statement.compile(dialect=bind.dialect)
+        params = sorted(compiled.params.items())
+        return (bind.url.render_as_string(), str(compiled), repr(params))
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                return None
+            if value[0] < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value[1]
+
+    def set(self, key, total, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, total)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+count_cache = _CountCache()
+
+
+def _count(obj, qexp, count, count_ttl):
+    qexp = qexp.order_by(None)
+    bind = qexp.session.get_bind(mapper=obj)
+
+    if count == 'estimate':
+        estimator = COUNT_ESTIMATORS.get(bind.dialect.name)
+        if estimator is not None:
+            try:
+                total = estimator(obj, qexp, bind)
+            except Exception:
+                logger.warning('estimate count failed, use exact count.',
+                               exc_info=True)
+            else:
+                if total is not None:
+                    return total
+        return qexp.count()
+
+    key = count_cache.make_key(qexp, bind)
+    total = count_cache.get(key)
+    if total is None:
+        total = qexp.count()
+        count_cache.set(key, total, count_ttl)
+    return total
 
 
 def pagination(obj: 'model.DefaultMeta', page: int, page_size: int,
-               order_by: Union[str, List[str], None] = 'id', query_exp=None) \
+               order_by: Union[str, List[str], None] = 'id', query_exp=None,
+               count: Optional[str] = 'exact', count_ttl: int = 60,
+               schema: Union[Schema, Type[Schema], List[str], None] = None) \
         -> PaginationType:
     """A pagination for sqlalchemy query.
 
@@ -50,38 +356,280 @@ def pagination(obj: 'model.DefaultMeta', page: int, page_size: int,
         order_by (str, list, None): Example: 'id'、['-id', 'column_name'].
         query_exp (flask_sqlalchemy.BaseQuery): Query like \
             ``User.query.filter_by(id=1)``.
+        count (str, None): How to get ``total``:
+
+            * ``'exact'``: ``COUNT(*)`` the query.
+            * ``'cached'``: exact count cached per query for ``count_ttl`` \
+                seconds, see ``count_cache``.
+            * ``'estimate'``: row estimate from db planner, see \
+                ``COUNT_ESTIMATORS``.
+            * ``None``: skip counting, ``total`` is None unless last page \
+                reached, use ``has_next`` instead.
+        count_ttl (int): Seconds to cache count, only for ``'cached'``.
+        schema (Schema, list, None): Schema used to dump items (or \
+            ``PagedSchema`` of it) or field list like \
+            ``['id', 'username', 'posts.title']``. Only dumped columns are \
+            loaded (``load_only``) and dumped relationships are eager \
+            loaded by ``selectinload``.
 
     Returns:
-        dict: Dict contains ``items``、``page``、``page_size`` and \
-            ``total`` fileds.
+        dict: Dict contains ``items``、``page``、``page_size``、``total`` \
+            and ``has_next`` fileds.
     """
     if not isinstance(obj, model.DefaultMeta):
         raise Exception('first arg obj must be model.')
 
     qexp = query_exp or getattr(obj, 'query')
 
+    order_map = get_order_by_map(obj)
+    order_by = _get_order_by(obj, order_by)
     if order_by:
-        if not isinstance(order_by, list):
-            order_by = [order_by]
+        qexp = qexp.order_by(*[order_map[key] for key in order_by])
 
-        order_by = [i for i in order_by if i]  # exclude ''
+    if schema is not None:
+        options = get_load_options(obj, get_projection(schema))
+        if options:
+            qexp = qexp.options(*options)
 
-        columns = {i.name for i in obj.__table__.columns}
-        diff = {c.lstrip('-') for c in order_by} - columns
-        if diff:
-            raise Exception(f'columns {diff} not exist in {obj} model')
+    if count == 'exact':
+        items = qexp.paginate(page=page, per_page=page_size, error_out=False)
+        return {
+            'items': items.items, 'page': page, 'page_size': page_size,
+            'total': items.total, 'has_next': items.has_next,
+        }
+    if count not in ('cached', 'estimate', None):
+        raise Exception(f'not support count: {count}')
 
-        order_exp = []
-        for column in order_by:
-            if column.startswith('-'):
-                order_exp.append(getattr(obj, column.lstrip('-')).desc())
-            else:
-                order_exp.append(getattr(obj, column))
-        qexp = qexp.order_by(*order_exp)
+    # fetch one more row to know has_next without counting
+    offset = (page - 1) * page_size
+    items = qexp.limit(page_size + 1).offset(offset).all()
+    has_next = len(items) > page_size
+    items = items[:page_size]
+
+    total = None
+    if not has_next and (items or page == 1):
+        total = offset + len(items)  # last page, total is known
+    elif count is not None:
+        total = _count(obj, qexp, count, count_ttl)
+        if has_next:
+            total = max(total, offset + page_size + 1)
+
+    return {
+        'items': items, 'page': page, 'page_size': page_size,
+        'total': total, 'has_next': has_next,
+    }
+
+
+class CursorPaginationType(TypedDict):
+    items: list
+    page_size: int
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
+
+
+def _get_order_by(obj, order_by):
+    """Validate order_by and return it as list, like ``['-id', 'name']``."""
+    if not order_by:
+        return []
+    if not isinstance(order_by, list):
+        order_by = [order_by]
+
+    order_map = get_order_by_map(obj)
+    order_by = [i for i in order_by if i]  # exclude ''
+    diff = {c.lstrip('-') for c in order_by if c not in order_map}
+    if diff:
+        raise Exception(f'columns {diff} not exist in {obj} model')
+
+    return order_by
+
+
+def _dump_cursor_value(value):
+    if isinstance(value, enum.Enum):
+        return value.name
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    return value
+
+
+def _load_cursor_value(column, value):
+    """Load a value of cursor to column's python type.
+
+    Raises:
+        HobbitException: If value can not be a value of column.
+    """
+    if value is None:
+        if column.nullable:
+            return value
+        raise HobbitException('invalid cursor')
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        python_type = None
+    try:
+        if python_type is None:
+            if isinstance(value, (list, dict)):
+                raise TypeError(value)
+            return value
+        if issubclass(python_type, enum.Enum):
+            value = python_type[value]
+        elif python_type in (datetime.datetime, datetime.date, datetime.time):
+            value = python_type.fromisoformat(value)
+        elif python_type is decimal.Decimal:
+            if not isinstance(value, (str, int)) or isinstance(value, bool):
+                raise TypeError(value)
+            value = decimal.Decimal(value)
+        elif python_type is float and type(value) is int:
+            value = float(value)
+    except (KeyError, TypeError, ValueError, decimal.InvalidOperation):
+        raise HobbitException('invalid cursor')
+    if not isinstance(value, python_type) or \
+            (isinstance(value, bool) and python_type is not bool):
+        raise HobbitException('invalid cursor')
+    return value
+
+
+def _seek_equal(column, value):
+    return column.is_(None) if value is None else column == value
+
+
+def _seek_after(column, value, desc: bool, nullable: bool):
+    """Rows after value in order of column, NULL is greater than values.
+    """
+    if desc:
+        if value is None:
+            return column.isnot(None)
+        return column < value
+    if value is None:
+        return false()
+    return or_(column > value, column.is_(None)) if nullable else \
+        column > value
+
+
+def encode_cursor(values: list, backward: bool = False,
+                  keys: Optional[list] = None) -> str:
+    """Encode sort keys' values of a row to an opaque cursor string."""
+    payload = {'v': [_dump_cursor_value(v) for v in values], 'b': backward}
+    if keys is not None:
+        payload['k'] = keys
+    data = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor: str) -> dict:
+    """Decode cursor which generated by :func:`encode_cursor`.
+
+    Raises:
+        HobbitException: If cursor is malformed.
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(data)
+    except Exception:
+        raise HobbitException('invalid cursor')
+    if not isinstance(payload, dict) or \
+            not isinstance(payload.get('v'), list):
+        raise HobbitException('invalid cursor')
+    return payload
+
+
+def cursor_pagination(obj: 'model.DefaultMeta', cursor: Optional[str],
+                      page_size: int,
+                      order_by: Union[str, List[str], None] = 'id',
+                      query_exp=None,
+                      schema: Union[Schema, Type[Schema], List[str],
+                                    None] = None) -> CursorPaginationType:
+    """A keyset (seek) pagination for sqlalchemy query. Rows are located by
+    ``WHERE (order_by columns) > (values of last row)`` instead of
+    ``OFFSET``, so deep pages cost the same as the first one. Primary key is
+    appended to ``order_by`` as a tie-breaker.
+
+    NULL of nullable sort columns is sorted after all values (before them
+    with ``-``) on every db, so rows with NULL are paged too.
+
+    Args:
+        obj (db.Model): Model class like User.
+        cursor (str, None): ``next_cursor`` or ``prev_cursor`` returned by \
+            previous call, None for the first page.
+        page_size (int): Row's count per page.
+        order_by (str, list, None): Example: 'id'、['-id', 'column_name'].
+        query_exp (flask_sqlalchemy.BaseQuery): Query like \
+            ``User.query.filter_by(id=1)``.
+        schema (Schema, list, None): Load only what schema dumps, see \
+            :func:`pagination`.
+
+    Returns:
+        dict: Dict contains ``items``、``page_size``、``next_cursor`` and \
+            ``prev_cursor`` fileds, cursor is None if no more rows.
+    """
+    if not isinstance(obj, model.DefaultMeta):
+        raise Exception('first arg obj must be model.')
+
+    qexp = query_exp or getattr(obj, 'query')
+
+    order_map = get_order_by_map(obj)
+    order_keys = [(c.lstrip('-'), c.startswith('-'))
+                  for c in _get_order_by(obj, order_by)]
+    tie_desc = order_keys[-1][1] if order_keys else False
+    names = [name for name, _ in order_keys]
+    for column in obj.__table__.primary_key.columns:
+        if column.name not in names:
+            order_keys.append((column.name, tie_desc))
+            names.append(column.name)
+
+    if schema is not None:
+        # sort keys are read from items to generate cursors
+        options = get_load_options(
+            obj, get_projection(schema), tuple(names))
+        if options:
+            qexp = qexp.options(*options)
+
+    backward = False
+    if cursor is not None:
+        payload = decode_cursor(cursor)
+        backward = bool(payload.get('b'))
+        if payload.get('k', names) != names or \
+                len(payload['v']) != len(names):
+            raise HobbitException('cursor not match order_by')
+        values = [
+            _load_cursor_value(obj.__table__.columns[name], value)
+            for name, value in zip(names, payload['v'])]
+
+        # (a, b) > (x, y)  =>  a > x OR (a = x AND b > y)
+        clauses = []
+        for i, (name, desc) in enumerate(order_keys):
+            clauses.append(and_(*[
+                _seek_equal(order_map[n], v)
+                for (n, _), v in zip(order_keys[:i], values)],
+                _seek_after(order_map[name], values[i], desc ^ backward,
+                            obj.__table__.columns[name].nullable)))
+        qexp = qexp.filter(or_(*clauses))
+
+    ordering = []
+    for name, desc in order_keys:
+        if obj.__table__.columns[name].nullable:
+            is_null = case((order_map[name].is_(None), 1), else_=0)
+            ordering.append(is_null.desc() if desc ^ backward else is_null)
+        ordering.append(order_map[f'-{name}' if desc ^ backward else name])
+    qexp = qexp.order_by(*ordering)
+
+    items = qexp.limit(page_size + 1).all()
+    has_more = len(items) > page_size
+    items = items[:page_size]
+    if backward:
+        items.reverse()
 
-    items = qexp.paginate(page=page, per_page=page_size, error_out=False)
+    def gen_cursor(item, backward):
+        return encode_cursor(
+            [getattr(item, name) for name in names], backward, names)
 
+    has_next, has_prev = (cursor is not None, has_more) if backward else \
+        (has_more, cursor is not None)
     return {
-        'items': items.items, 'page': page, 'page_size': page_size,
-        'total': items.total,
+        'items': items, 'page_size': page_size,
+        'next_cursor': gen_cursor(items[-1], False)
+        if items and has_next else None,
+        'prev_cursor': gen_cursor(items[0], True)
+        if items and has_prev else None,
     }
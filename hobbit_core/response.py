@@ -1,8 +1,23 @@
-from typing import Optional, Any
+import dataclasses
+import datetime
+import decimal
+import enum
+import itertools
+import json
+import uuid
+from typing import Callable, Dict, Iterable, Iterator, NamedTuple, \
+    Optional, Any
 from mypy_extensions import TypedDict
 
 from flask.json import dumps
-from flask import current_app, Response
+from flask import Flask, current_app, has_app_context, \
+    has_request_context, request, stream_with_context, Response
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
 
 RESP_MSGS = {
     200: 'ok',
@@ -23,6 +38,137 @@ class RespType(TypedDict):
     detail: Any
 
 
+def _json_default(o):
+    """Same as flask's default json provider, plus ``time`` and ``Enum``.
+    """
+    if isinstance(o, datetime.date):
+        return http_date(o)
+    if isinstance(o, datetime.time):
+        return o.isoformat()
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if isinstance(o, enum.Enum):
+        return o.value
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(
+        f'Object of type {type(o).__name__} is not JSON serializable')
+
+
+def _dumps_flask(obj: Any) -> bytes:
+    return dumps(obj, indent=0, separators=(',', ':')).encode()
+
+
+def _dumps_json(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'),
+                      default=_json_default).encode()
+
+
+def _dumps_orjson(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=_json_default, option=(
+        orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME))
+
+
+#: Serializers of ``Result`` body, keyed by name, select one by
+#: ``HOBBIT_JSON_SERIALIZER`` config. A serializer is called with response
+#: dict and returns bytes.
+#:
+#: * ``json``: stdlib ``json.dumps`` without whitespace.
+#: * ``orjson``: `orjson <https://github.com/ijl/orjson>`_, if installed.
+#: * ``flask``: ``flask.json.dumps(indent=0)``, honors ``app.json``.
+#: * ``auto`` (default): ``orjson`` if installed else ``json``.
+JSON_SERIALIZERS: Dict[str, Callable[[Any], bytes]] = {
+    'json': _dumps_json,
+    'flask': _dumps_flask,
+}
+if orjson is not None:
+    JSON_SERIALIZERS['orjson'] = _dumps_orjson
+
+
+def get_json_serializer(name: Optional[str] = None) -> \
+        Callable[[Any], bytes]:
+    """Serializer by name, default is ``HOBBIT_JSON_SERIALIZER`` config.
+    """
+    if name is None:
+        name = current_app.config.get('HOBBIT_JSON_SERIALIZER', 'auto') \
+            if has_app_context() else 'auto'
+    if name == 'auto':
+        name = 'orjson' if 'orjson' in JSON_SERIALIZERS else 'json'
+    if name not in JSON_SERIALIZERS:
+        raise Exception(f'not support json serializer: {name}')
+    return JSON_SERIALIZERS[name]
+
+
+class ResponseSettings(NamedTuple):
+    """Response configs frozen by ``HobbitManager.init_app``.
+    """
+    #: ``HOBBIT_USE_CODE_ORIGIN_TYPE``
+    use_origin_type: bool
+    #: ``RESP_MSGS`` updated by ``HOBBIT_RESPONSE_MESSAGE_MAPS``
+    messages: Dict[Any, str]
+    #: ``HOBBIT_RESPONSE_DETAIL`` is False
+    hide_server_error_detail: bool
+    #: ``HOBBIT_JSON_SERIALIZER``
+    serializer: Callable[[Any], bytes]
+    #: Encoded bodies of argument-free results, see ``Result.encode``,
+    #: dropped with settings when reloaded.
+    encoded: Dict[tuple, bytes]
+
+    @classmethod
+    def from_config(cls, config) -> 'ResponseSettings':
+        resp_msgs = config.get('HOBBIT_RESPONSE_MESSAGE_MAPS', {})
+        assert isinstance(resp_msgs, dict), \
+            'HOBBIT_RESPONSE_MESSAGE_MAPS must be dict type.'
+        messages = dict(RESP_MSGS)
+        messages.update(
+            (k, v) for k, v in resp_msgs.items() if v is not None)
+
+        return cls(
+            use_origin_type=config.get(
+                'HOBBIT_USE_CODE_ORIGIN_TYPE', False) is not False,
+            messages=messages,
+            hide_server_error_detail=config.get(
+                'HOBBIT_RESPONSE_DETAIL', True) is False,
+            serializer=get_json_serializer(
+                config.get('HOBBIT_JSON_SERIALIZER', 'auto')),
+            encoded={},
+        )
+
+
+_default_settings = ResponseSettings.from_config({})
+
+
+def reload_response_settings(app: Optional[Flask] = None) -> \
+        ResponseSettings:
+    """Freeze response configs of app (default is ``current_app``), called
+    by ``HobbitManager.init_app``. Call it again after configs changed::
+
+        app.config['HOBBIT_RESPONSE_DETAIL'] = False
+        reload_response_settings(app)
+    """
+    app = app or current_app
+    settings = ResponseSettings.from_config(app.config)
+    app.extensions['hobbit_core.response'] = settings
+    return settings
+
+
+def get_response_settings() -> ResponseSettings:
+    """Settings frozen by :func:`reload_response_settings`. Read from config
+    if app not inited by ``HobbitManager``, default settings if out of app
+    context.
+    """
+    try:
+        extensions = current_app.extensions
+    except RuntimeError:  # out of app context
+        return _default_settings
+    settings = extensions.get('hobbit_core.response')
+    if settings is None:
+        settings = ResponseSettings.from_config(current_app.config)
+    return settings
+
+
 def gen_response(code: int, message: str = None, detail: Optional[str] = None,
                  data=None) -> RespType:
     """Func for generate response body.
@@ -44,24 +190,20 @@ def gen_response(code: int, message: str = None, detail: Optional[str] = None,
     2021-07-13 Updated:
         Support set `HOBBIT_RESPONSE_MESSAGE_MAPS` to use self-defined
         response message. `HOBBIT_RESPONSE_MESSAGE_MAPS` must be dict.
+
+    Configs are read from :func:`get_response_settings`, call
+    :func:`reload_response_settings` after changed.
     """
-    use_origin_type = current_app.config.get(
-        'HOBBIT_USE_CODE_ORIGIN_TYPE', False)
+    settings = get_response_settings()
 
-    resp_msgs = current_app.config.get('HOBBIT_RESPONSE_MESSAGE_MAPS', {})
-    assert isinstance(resp_msgs, dict), \
-        'HOBBIT_RESPONSE_MESSAGE_MAPS must be dict type.'
     if not message:
-        message = resp_msgs.get(code)
-        if message is None:
-            message = RESP_MSGS.get(code, 'unknown')
+        message = settings.messages.get(code, 'unknown')
 
-    if current_app.config.get("HOBBIT_RESPONSE_DETAIL", True) is False \
-            and code == 500:
+    if settings.hide_server_error_detail and code == 500:
         detail = None
 
     return {
-        'code': str(code) if use_origin_type is False else code,
+        'code': code if settings.use_origin_type else str(code),
         'message': message,  # type: ignore
         'data': data,
         'detail': detail,
@@ -69,22 +211,40 @@ def gen_response(code: int, message: str = None, detail: Optional[str] = None,
 
 
 class Result(Response):
-    """Base json response.
+    """Base json response. Body is serialized by ``HOBBIT_JSON_SERIALIZER``,
+    see ``JSON_SERIALIZERS``.
     """
     _hobbit_status = 200  # type: ignore
 
     def __init__(self, response=None, status=None, headers=None,
                  mimetype='application/json', content_type=None,
                  direct_passthrough=False):
-        assert sorted(response.keys()) == [
-            'code', 'data', 'detail', 'message'], \
-            'Error response, must include keys: code, data, detail, message'
+        if not isinstance(response, bytes):  # bytes from Result.encode
+            assert sorted(response.keys()) == [
+                'code', 'data', 'detail', 'message'], \
+                'Error response, must include keys: code, data, detail, ' \
+                'message'
+            response = get_response_settings().serializer(response) + b'\n'
         super().__init__(
-            response=dumps(response, indent=0, separators=(',', ':')) + '\n',
+            response=response,
             status=status if status is not None else self._hobbit_status,
             headers=headers, mimetype=mimetype,
             content_type=content_type, direct_passthrough=direct_passthrough)
 
+    @classmethod
+    def encode(cls, code: int, message: str = '') -> bytes:
+        """Body of ``gen_response(code, message)``, encoded once per
+        (class, code, message) until response settings reloaded. Only for
+        a fixed set of messages, dynamic ones would grow the cache.
+        """
+        settings = get_response_settings()
+        key = (cls, code, message)
+        body = settings.encoded.get(key)
+        if body is None:
+            body = settings.serializer(gen_response(code, message)) + b'\n'
+            settings.encoded[key] = body
+        return body
+
 
 class SuccessResult(Result):
     """Success response. Default status is 200, you can cover it by status arg.
@@ -93,10 +253,13 @@ class SuccessResult(Result):
 
     def __init__(self, message: str = '', code: Optional[int] = None,
                  detail: Any = None, status: Optional[int] = None, data=None):
-        super().__init__(
-            gen_response(code if code is not None else self._hobbit_status,
-                         message, detail, data),
-            status or self._hobbit_status)
+        if not message and code is None and detail is None and data is None:
+            response = self.encode(self._hobbit_status)
+        else:
+            response = gen_response(
+                code if code is not None else self._hobbit_status,
+                message, detail, data)
+        super().__init__(response, status or self._hobbit_status)
 
 
 class FailedResult(Result):
@@ -106,11 +269,13 @@ class FailedResult(Result):
 
     def __init__(self, message: str = '', code: Optional[int] = None,
                  detail: Any = None):
-        super().__init__(
-            gen_response(
+        if not message and code is None and detail is None:
+            response = self.encode(self._hobbit_status)
+        else:
+            response = gen_response(
                 code if code is not None else self._hobbit_status,
-                message, detail),
-            self._hobbit_status)
+                message, detail)
+        super().__init__(response, self._hobbit_status)
 
 
 class UnauthorizedResult(FailedResult):
@@ -127,3 +292,89 @@ class ValidationErrorResult(FailedResult):
 
 class ServerErrorResult(FailedResult):
     _hobbit_status = 500
+
+
+class StreamingResult(Response):
+    """Json response which streams ``data`` items chunk by chunk, so memory
+    is bounded by ``chunk_size`` instead of the whole list. Body is the same
+    ``{code, message, data, detail}`` envelope as ``SuccessResult``, with
+    ``data`` (a list) at the end.
+
+    ``items`` can be any iterable, like generator or query. Query is
+    fetched by ``yield_per(chunk_size)``. Request context is kept until
+    streaming finished (``flask.stream_with_context``), so lazy queries
+    still work.
+
+    Examples::
+
+        @bp.route('/users/export/', methods=['GET'])
+        def export_users():
+            return StreamingResult(
+                User.query.order_by(User.id), dump=UserSchema().dump)
+
+    Args:
+        items (iterable): Items of ``data``.
+        dump (callable): Convert item to json-able object, like \
+            ``schema.dump``.
+        chunk_size (int): Items serialized per chunk.
+    """
+    _hobbit_status = 200
+
+    def __init__(self, items: Iterable, message: str = '',
+                 code: Optional[int] = None, detail: Any = None,
+                 status: Optional[int] = None,
+                 dump: Optional[Callable[[Any], Any]] = None,
+                 chunk_size: int = 500, headers=None,
+                 mimetype='application/json'):
+        status = status or self._hobbit_status
+        envelope = gen_response(
+            code if code is not None else status, message, detail)
+        if hasattr(items, 'yield_per'):
+            items = items.yield_per(chunk_size)
+
+        chunks = self._iter_chunks(
+            envelope, items, dump, chunk_size,
+            get_response_settings().serializer)
+        if has_request_context():
+            chunks = stream_with_context(chunks)
+        super().__init__(response=chunks, status=status, headers=headers,
+                         mimetype=mimetype)
+
+    @staticmethod
+    def _iter_chunks(envelope, items, dump, chunk_size, serializer) \
+            -> Iterator[bytes]:
+        yield b'{' + b''.join(
+            serializer(key) + b':' + serializer(envelope[key]) + b','
+            for key in ('code', 'message', 'detail')) + b'"data":['
+
+        iterator = iter(items)
+        first = True
+        while True:
+            chunk = list(itertools.islice(iterator, chunk_size))
+            if not chunk:
+                break
+            if dump is not None:
+                chunk = [dump(item) for item in chunk]
+            body = serializer(chunk).strip()[1:-1]  # remove []
+            yield body if first else b',' + body
+            first = False
+        yield b']}\n'
+
+
+def enum_options_response(module: Optional[str] = None) -> Response:
+    """Response of all ``EnumExt`` options for frontend. Body and ETag are
+    prebuilt by ``hobbit_core.db.enum_registry``, return ``304 Not Modified``
+    when ``If-None-Match`` matched.
+
+    Examples::
+
+        @bp.route('/options', methods=['GET'])
+        def option():
+            return enum_options_response('app.models.consts')
+    """
+    from .db import enum_registry
+
+    payload, etag = enum_registry.encoded_options(module)
+    response = Response(payload, mimetype='application/json')
+    response.set_etag(etag)
+    return response.make_conditional(request)
@@ -1,6 +1,18 @@
+import copy
+import datetime
+import functools
+import keyword
+from typing import (
+    Any, Callable, Dict, FrozenSet, Iterator, List, Optional, Tuple, Type,
+    Union,
+)
+
 from marshmallow import (
-    Schema as Schema_, fields, pre_load, post_load, post_dump,
+    Schema as Schema_, class_registry, fields, pre_load, post_load,
+    post_dump, missing,
 )
+from marshmallow.decorators import PRE_DUMP, POST_DUMP
+from sqlalchemy import inspect as sa_inspect
 from marshmallow_sqlalchemy.schema import SQLAlchemyAutoSchemaMeta
 from flask_marshmallow.sqla import \
     SQLAlchemyAutoSchema as SQLAlchemyAutoSchema_
@@ -34,6 +46,93 @@ class ORMSchema(SQLAlchemyAutoSchema_):
     def make_instance(self, data, many, **kwargs):
         return data
 
+    def row_columns(self) -> List[Any]:
+        """Model columns dumped by schema, select them for
+        :meth:`dump_rows`.
+        """
+        mapper = sa_inspect(self.opts.model)
+        return [mapper.column_attrs[name].class_attribute for name in (
+            field.attribute or attr_name
+            for attr_name, field in self.dump_fields.items()
+        ) if name in mapper.column_attrs]
+
+    def dump_rows(self, rows) -> List[Dict[str, Any]]:
+        """Dump ``Row`` of a column-projected query, same as dump model
+        instances with ``many=True``, but skips building instances. Rows
+        are dumped by a function compiled once per row keys, see
+        :func:`compile_rows_dump`.
+
+        Example::
+
+            schema = UserSchema()
+            rows = db.session.execute(
+                select(*schema.row_columns()).order_by(User.id)).all()
+            schema.dump_rows(rows)
+        """
+        if not isinstance(rows, (list, tuple)):
+            rows = list(rows)
+        if not rows:
+            return []
+        keys = tuple(rows[0]._fields)
+        dumps = self.__dict__.setdefault('_rows_dumps', {})
+        if keys not in dumps:
+            dumps[keys] = compile_rows_dump(self, keys)
+        dump = dumps[keys]
+        return [dump(row) for row in rows]
+
+
+#: Datetime format of ``SchemaMixin`` and ``ModelSchema``.
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def format_datetime(value: datetime.datetime) -> str:
+    """Same as ``value.strftime(DATETIME_FORMAT)``, formats datetime by
+    ``isoformat`` (``strftime`` is used for dates, subclasses and years
+    before 1000, which are not zero padded by ``strftime``).
+    """
+    if value.__class__ is datetime.datetime and value.year >= 1000:
+        return value.isoformat(' ', 'seconds')[:19]
+    return value.strftime(DATETIME_FORMAT)
+
+
+def parse_datetime(value: str) -> datetime.datetime:
+    """Same as ``datetime.strptime(value, DATETIME_FORMAT)``, parses zero
+    padded value by ``fromisoformat`` (``strptime`` is used for others).
+    """
+    if value.__class__ is str and len(value) == 19 and value.isascii() \
+            and value[4] == value[7] == '-' and value[10] == ' ' \
+            and value[13] == value[16] == ':':
+        try:
+            return datetime.datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    return datetime.datetime.strptime(value, DATETIME_FORMAT)
+
+
+class DateTimeField(fields.DateTime):
+    """DateTime field with default format ``DATETIME_FORMAT``, which is
+    dumped and loaded by :func:`format_datetime` and
+    :func:`parse_datetime` instead of ``strftime`` and ``strptime``.
+
+    Example::
+
+        class UserSchema(Schema):
+            last_login = DateTimeField(allow_none=True)
+    """
+
+    SERIALIZATION_FUNCS = {
+        **fields.DateTime.SERIALIZATION_FUNCS,
+        DATETIME_FORMAT: format_datetime,
+    }
+
+    DESERIALIZATION_FUNCS = {
+        **fields.DateTime.DESERIALIZATION_FUNCS,
+        DATETIME_FORMAT: parse_datetime,
+    }
+
+    def __init__(self, format: Optional[str] = DATETIME_FORMAT, **kwargs):
+        super().__init__(format, **kwargs)
+
 
 class SchemaMixin(object):
     """Add ``id``, ``created_at``, ``updated_at`` fields to schema,
@@ -50,13 +149,13 @@ class SchemaMixin(object):
     """
 
     id = fields.Int(dump_only=True)
-    created_at = fields.DateTime('%Y-%m-%d %H:%M:%S', dump_only=True)
-    updated_at = fields.DateTime('%Y-%m-%d %H:%M:%S', dump_only=True)
+    created_at = DateTimeField(dump_only=True)
+    updated_at = DateTimeField(dump_only=True)
 
     class Meta:
         strict = True
         ordered = False
-        dateformat = '%Y-%m-%d %H:%M:%S'
+        dateformat = DATETIME_FORMAT
 
 
 class PagedSchema(Schema_):
@@ -85,21 +184,111 @@ class PagedSchema(Schema_):
         paged_user_schemas = PagedUserSchema()
     """
 
-    total = fields.Int()
+    total = fields.Int(allow_none=True)
     page = fields.Int(missing=1, default=1)
     page_size = fields.Int(missing=10, default=10)
+    has_next = fields.Bool()
+
+    class Meta:
+        strict = True
+
+
+class CursorPagedSchema(Schema_):
+    """Base schema for list api cursor pagination, see
+    ``hobbit_core.pagination.cursor_pagination``.
+
+    Example::
+
+        class CursorPagedUserSchema(CursorPagedSchema):
+            items = fields.Nested('UserSchema', many=True)
+    """
+
+    next_cursor = fields.Str(allow_none=True)
+    prev_cursor = fields.Str(allow_none=True)
+    page_size = fields.Int(missing=10, default=10)
 
     class Meta:
         strict = True
 
 
+@functools.lru_cache(maxsize=None)
+def _enum_dump_table(enum, verbose: bool) -> Dict[Any, Dict[str, Any]]:
+    """Option dict of every member, keyed by member and label."""
+    table = {}
+    for member, opt in zip(enum, enum.to_opts(verbose)):
+        table[member] = table[member.name] = opt
+    return table
+
+
+class EnumExtField(EnumField):
+    """Field for ``db.EnumExt``. Loads label, key or value to member and
+    dumps member (or label) to option dict, converted inline by prebuilt
+    tables instead of schema hooks.
+
+    ``verbose`` defaults to ``verbose`` of schema's ``Meta`` (True if not
+    set), see ``EnumExt.dump``.
+
+    Example::
+
+        class UserSchema(Schema):
+            role = EnumExtField(RoleEnum)
+
+        UserSchema().dump(user)['role']
+        # {'key': 1, 'value': '管理员', 'label': 'admin'}
+        UserSchema().load({'role': '管理员'})['role']  # RoleEnum.admin
+    """
+
+    def __init__(self, enum, verbose: Optional[bool] = None, *args,
+                 **kwargs):
+        super().__init__(enum, *args, **kwargs)
+        self.verbose = verbose
+
+    @classmethod
+    def from_enum_field(cls, field: EnumField) -> 'EnumExtField':
+        """Copy a ``marshmallow_enum.EnumField`` as EnumExtField, keeps all
+        its options.
+        """
+        new = copy.copy(field)
+        new.__class__ = cls
+        new.verbose = None
+        return new
+
+    def _bind_to_schema(self, field_name, schema):
+        super()._bind_to_schema(field_name, schema)
+        verbose = self.verbose
+        if verbose is None:
+            verbose = getattr(self.root.Meta, 'verbose', True)
+        self._dump_table = _enum_dump_table(self.enum, bool(verbose))
+
+    def _serialize(self, value, attr, obj, **kwargs):
+        if value is None:
+            return None
+        table = getattr(self, '_dump_table', None)
+        if table is None:  # not bound to schema
+            table = _enum_dump_table(self.enum, self.verbose is not False)
+        return dict(table[value])
+
+    def _deserialize(self, value, attr, data, **kwargs):
+        try:
+            label = self.enum.load(value)
+        except TypeError:  # unhashable
+            label = None
+        if label is None:
+            raise self.make_error('by_name', input=value, name=value)
+        return self.enum[label]
+
+
 class EnumSetMeta(SQLAlchemyAutoSchemaMeta):
-    """EnumSetMeta is a metaclass that can be used to auto generate load and
-    dump func for EnumField.
+    """EnumSetMeta is a metaclass that converts declared ``EnumField`` (of
+    ``EnumExt``) to :class:`EnumExtField`, so enums are loaded and dumped
+    inline without schema hooks.
     """
 
     @classmethod
     def gen_func(cls, decorator, field_name, enum, verbose=True):
+        """Generate load or dump hook for EnumField. Kept for compatibility,
+        not used by EnumSetMeta any more.
+        """
 
         @decorator
         def wrapper(self, data, many, **kwargs):
@@ -121,22 +310,161 @@ class EnumSetMeta(SQLAlchemyAutoSchemaMeta):
     def __new__(cls, name, bases, attrs):
         schema = SQLAlchemyAutoSchemaMeta.__new__(
             cls, name, tuple(bases), attrs)
-        verbose = getattr(schema.Meta, 'verbose', True)
 
-        setattr(schema.Meta, 'dateformat', '%Y-%m-%d %H:%M:%S')
+        setattr(schema.Meta, 'dateformat', DATETIME_FORMAT)
 
         for field_name, declared in schema._declared_fields.items():
-            if not isinstance(declared, EnumField):
-                continue
-
-            setattr(schema, 'load_{}'.format(field_name), cls.gen_func(
-                pre_load, field_name, declared.enum))
-            setattr(schema, 'dump_{}'.format(field_name), cls.gen_func(
-                post_dump, field_name, declared.enum, verbose=verbose))
+            if isinstance(declared, EnumField) and \
+                    not isinstance(declared, EnumExtField):
+                schema._declared_fields[field_name] = \
+                    EnumExtField.from_enum_field(declared)
 
         return schema
 
 
+#: Field ``_serialize`` which returns value itself for these exact types.
+_SAME_TYPE_SERIALIZERS = {
+    fields.String._serialize: str,
+    fields.Boolean._serialize: bool,
+}
+
+
+def _dump_plan_step(field, getter: Optional[str]) -> Tuple[str, Any]:
+    """Returns ``(kind, arg)`` of the inline dump code for field, value is
+    got by ``getter`` source (``None`` to use ``field.serialize``).
+    """
+    if getter is None or type(field).serialize is not fields.Field.serialize:
+        return 'field', field
+    serialize = type(field)._serialize
+    if serialize is fields.Field._serialize:
+        return 'raw', None
+    if serialize in _SAME_TYPE_SERIALIZERS:
+        return _SAME_TYPE_SERIALIZERS[serialize].__name__, field
+    if serialize is fields.Number._serialize and not field.as_string and \
+            type(field)._format_num is fields.Number._format_num and \
+            field.num_type in (int, float):
+        return field.num_type.__name__, field
+    if serialize is fields.DateTime._serialize:
+        data_format = field.format or field.DEFAULT_FORMAT
+        format_func = field.SERIALIZATION_FUNCS.get(data_format)
+        if format_func:
+            return 'format', format_func
+        if data_format == DATETIME_FORMAT:
+            return 'format', format_datetime
+        return 'strftime', data_format
+    if serialize is EnumExtField._serialize and \
+            hasattr(field, '_dump_table'):
+        return 'enum', field._dump_table
+    return 'value', field
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_dump_plan(
+        plan: Tuple[Tuple[str, Optional[str], str, str, Optional[str]], ...]):
+    """Generate source of dump function for plan, only once for every
+    schema class (and ``only``, ``exclude``) and bind args per schema.
+    """
+    lines = []
+    for i, (attr_name, getter, key, kind, literal) in enumerate(plan):
+        ret = f'ret[{key!r}]'
+        if kind == 'field':
+            lines.append(f'v = f{i}.serialize({attr_name!r}, obj, accessor)')
+            lines.append(f'if v is not missing: {ret} = v')
+            continue
+        if kind == 'raw':
+            lines.append(f'{ret} = {getter}')
+            continue
+        lines.append(f'v = {getter}')
+        if kind == 'strftime':
+            lines.append(f'{ret} = None if v is None else v.strftime('
+                         f'{literal!r})')
+        elif kind == 'format':
+            lines.append(f'{ret} = None if v is None else f{i}(v)')
+        elif kind == 'enum':
+            lines.append(f'{ret} = None if v is None else dict(f{i}[v])')
+        elif kind == 'value':
+            lines.append(f'{ret} = f{i}._serialize(v, {attr_name!r}, obj)')
+        else:  # same type
+            lines.append(
+                f'{ret} = v if v is None or v.__class__ is {kind} else '
+                f'f{i}._serialize(v, {attr_name!r}, obj)')
+
+    args = ''.join(f', f{i}' for i in range(len(plan)))
+    body = '\n'.join(f'        {line}' for line in lines)
+    source = (
+        f'def make(missing, accessor{args}):\n'
+        f'    def dump(obj):\n'
+        f'        ret = {{}}\n'
+        f'{body}\n'
+        f'        return ret\n'
+        f'    return dump\n')
+    namespace: Dict[str, Any] = {}
+    exec(compile(source, '<hobbit_core.schemas dump plan>', 'exec'),
+         namespace)
+    return namespace['make']
+
+
+def _compile(schema: Schema_, getters: Dict[str, Optional[str]]):
+    plan, args = [], []
+    for attr_name, field in schema.dump_fields.items():
+        getter = getters[attr_name]
+        kind, arg = _dump_plan_step(field, getter)
+        key = field.data_key if field.data_key is not None else attr_name
+        literal = arg if kind == 'strftime' else None
+        plan.append((attr_name, getter, key, kind, literal))
+        args.append(arg)
+    make = _compile_dump_plan(tuple(plan))
+    return make(missing, schema.get_attribute, *args)
+
+
+def compile_dump(schema: Schema_) -> Optional[Callable[[Any], dict]]:
+    """Compile a dump function of model instance for schema, which inline
+    plain attributes, datetime (with fixed format), ``EnumExtField`` and
+    use ``field.serialize`` for other fields. Returns ``None`` if schema
+    can not be compiled: not a model schema, has dump hooks, ordered,
+    custom ``get_attribute`` or model can be indexed.
+    """
+    model = getattr(schema.opts, 'model', None)
+    if model is None or schema.dict_class is not dict or \
+            schema._hooks[PRE_DUMP] or schema._hooks[POST_DUMP] or \
+            type(schema).get_attribute is not Schema_.get_attribute or \
+            hasattr(model, '__getitem__'):
+        return None
+
+    getters = {}
+    for attr_name, field in schema.dump_fields.items():
+        attribute = field.attribute or attr_name
+        direct = attribute.isidentifier() and \
+            not keyword.iskeyword(attribute) and \
+            hasattr(model, attribute) and \
+            getattr(field, '_CHECK_ATTRIBUTE', True)
+        getters[attr_name] = f'obj.{attribute}' if direct else None
+    return _compile(schema, getters)
+
+
+def compile_rows_dump(schema: Schema_, keys: Tuple[str, ...]
+                      ) -> Callable[[Any], dict]:
+    """Compile a dump function of ``Row`` (with ``keys``) for schema, like
+    :func:`compile_dump` but values are got from row by index.
+    """
+    if schema.dict_class is not dict or \
+            schema._hooks[PRE_DUMP] or schema._hooks[POST_DUMP]:
+        raise Exception(
+            'not support dump rows of schema with dump hooks or ordered')
+
+    index = {key: i for i, key in enumerate(keys)}
+    getters = {}
+    for attr_name, field in schema.dump_fields.items():
+        attribute = field.attribute or attr_name
+        if attribute in index:
+            getters[attr_name] = f'obj[{index[attribute]}]'
+        elif getattr(field, '_CHECK_ATTRIBUTE', True):
+            raise Exception(f'not support dump rows without `{attribute}`')
+        else:  # Method and Function field, called with row
+            getters[attr_name] = None
+    return _compile(schema, getters)
+
+
 class ModelSchema(ORMSchema, SchemaMixin, metaclass=EnumSetMeta):
     """Base ModelSchema for ``class Model(db.SurrogatePK)``.
 
@@ -145,6 +473,8 @@ class ModelSchema(ORMSchema, SchemaMixin, metaclass=EnumSetMeta):
     * Auto set dateformat to ``'%Y-%m-%d %H:%M:%S'``.
     * Auto use verbose for dump EnumField. See ``db.EnumExt``. You can define
       verbose in ``Meta``.
+    * Set ``compiled = True`` in ``Meta`` to dump model instances by a
+      generated function, see :func:`compile_dump`.
 
     Example::
 
@@ -158,4 +488,113 @@ class ModelSchema(ORMSchema, SchemaMixin, metaclass=EnumSetMeta):
         assert data['role'] == {'key': 1, 'label': 'admin', 'value': '管理员'}
 
     """
-    pass
+
+    def _get_compiled_dump(self):
+        try:
+            return self._compiled_dump
+        except AttributeError:
+            pass
+        self._compiled_dump = None
+        if getattr(self.Meta, 'compiled', False):
+            self._compiled_dump = compile_dump(self)
+        return self._compiled_dump
+
+    def dump(self, obj, *, many=None):
+        dump = self._get_compiled_dump()
+        many = self.many if many is None else bool(many)
+        if dump is not None and obj is not None:
+            model = self.opts.model
+            if not many:
+                if isinstance(obj, model):
+                    return dump(obj)
+            else:
+                if not isinstance(obj, (list, tuple)):
+                    obj = list(obj)
+                if all(isinstance(item, model) for item in obj):
+                    return [dump(item) for item in obj]
+        return super().dump(obj, many=many)
+
+
+_SchemaKey = Tuple[Type[Schema_], bool, Optional[FrozenSet[str]],
+                   FrozenSet[str], FrozenSet[str], FrozenSet[str]]
+
+#: Schema instances created by :func:`get_schema`.
+_schema_pool: Dict[_SchemaKey, Schema_] = {}
+
+
+def _option(value) -> FrozenSet[str]:
+    return frozenset(value or ())
+
+
+def _iter_nested(field: fields.Field) -> Iterator[fields.Nested]:
+    if isinstance(field, fields.Nested):
+        yield field
+    elif isinstance(field, fields.List):
+        yield from _iter_nested(field.inner)
+    elif isinstance(field, fields.Tuple):
+        for inner in field.tuple_fields:
+            yield from _iter_nested(inner)
+    elif isinstance(field, fields.Mapping) and field.value_field is not None:
+        yield from _iter_nested(field.value_field)
+
+
+def _prepare_nested(schema: Schema_) -> None:
+    """Set schema of ``Nested`` fields (declared by schema class or name)
+    to instances of pool, instead of creating them lazily.
+    """
+    for field in schema.fields.values():
+        for nested in _iter_nested(field):
+            if nested._schema is not None or schema.context:
+                continue
+            if nested.nested == 'self':
+                nested_class = type(nested.root)
+            elif isinstance(nested.nested, str):
+                nested_class = class_registry.get_class(
+                    nested.nested, all=False)
+            elif isinstance(nested.nested, type) and \
+                    issubclass(nested.nested, Schema_):
+                nested_class = nested.nested
+            else:  # instance, dict or callable, keeps marshmallow's way
+                continue
+            nested._schema = get_schema(
+                nested_class, many=nested.many, only=nested.only,
+                exclude=nested.exclude,
+                load_only=nested._nested_normalized_option('load_only'),
+                dump_only=nested._nested_normalized_option('dump_only'))
+
+
+def get_schema(schema: Union[str, Type[Schema_]],
+               many: Optional[bool] = None, only=None, exclude=(),
+               load_only=(), dump_only=()) -> Schema_:
+    """Returns a shared schema instance per (class, many, only, exclude,
+    load_only, dump_only), its ``Nested`` fields are resolved to shared
+    instances too, so schemas are only created once per process.
+
+    Returned schema must not be changed (or used with ``context``).
+
+    Example::
+
+        @bp.route('/users/', methods=['GET'])
+        def list_users():
+            schema = get_schema(PagedUserSchema)
+            return schema.dump(pagination(User, 1, 10))
+
+    Args:
+        schema: Schema class or its name in marshmallow class registry.
+    """
+    if isinstance(schema, str):
+        schema = class_registry.get_class(schema, all=False)
+    many = schema.opts.many if many is None else bool(many)
+    key = (schema, many, None if only is None else _option(only),
+           _option(exclude), _option(load_only), _option(dump_only))
+    try:
+        return _schema_pool[key]
+    except KeyError:
+        pass
+
+    instance = schema(many=many, only=only, exclude=exclude,
+                      load_only=load_only, dump_only=dump_only)
+    instance = _schema_pool.setdefault(key, instance)
+    # after added to pool, so a schema nested itself is resolved to itself
+    _prepare_nested(instance)
+    return instance
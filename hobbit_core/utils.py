@@ -2,12 +2,23 @@ try:
     from collections import Mapping
 except:  # noqa E722
     from collections.abc import Mapping
+import functools
 import inspect
 import importlib
+import io
+import itertools
+import json
 import os
 import re
+import sqlite3
 import sys
-from typing import Any, Dict, List, Optional
+import tempfile
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, \
+    ThreadPoolExecutor, wait
+from enum import Enum
+from typing import Any, Callable, Dict, Iterable, Iterator, List, \
+    Optional, Tuple, Union
 from unicodedata import normalize
 from distutils.version import LooseVersion
 import logging
@@ -15,8 +26,10 @@ import datetime
 
 from flask import request
 from flask_sqlalchemy import model
-from sqlalchemy import UniqueConstraint
-from sqlalchemy.sql import text
+from sqlalchemy import JSON, UniqueConstraint
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.sql import Executable, text
+from sqlalchemy.sql.elements import TextClause
 import marshmallow
 from marshmallow import Schema
 
@@ -116,11 +129,15 @@ def secure_filename(filename: str) -> str:
     return filename
 
 
+@functools.lru_cache(maxsize=None)
+def _get_init_argspec(base_class):
+    return inspect.getfullargspec(base_class.__init__)
+
+
 def _get_init_args(instance, base_class):
     """Get instance's __init__ args and it's value when __call__.
     """
-    getargspec = inspect.getfullargspec
-    argspec = getargspec(base_class.__init__)
+    argspec = _get_init_argspec(base_class)
 
     defaults = argspec.defaults
     kwargs = {}
@@ -152,6 +169,10 @@ def use_kwargs(argmap, schema_kwargs: Optional[Dict] = None, **kwargs: Any):
     Returns:
         dict: A dictionary of parsed arguments.
 
+    With partial schema, request is loaded once and only supplied fields
+    are returned, see ``CustomParser.partial_load``. Schemas are built once
+    when decorating.
+
     """
     schema_kwargs = schema_kwargs or {}
 
@@ -160,24 +181,23 @@ def use_kwargs(argmap, schema_kwargs: Optional[Dict] = None, **kwargs: Any):
     if not (argmap.partial or schema_kwargs.get('partial')):
         return base_use_kwargs(argmap, **kwargs)
 
-    def factory(request):
-        argmap_kwargs = _get_init_args(argmap, Schema)
-        argmap_kwargs.update(schema_kwargs)
-
-        # force set force_all=False
-        only = parser.parse(argmap, request).keys()
+    argmap_kwargs = _get_init_args(argmap, Schema)
+    argmap_kwargs.update(schema_kwargs)
+    argmap_kwargs['context'] = {"request": request}
+    if tuple(LooseVersion(marshmallow.__version__).version)[0] < 3:
+        argmap_kwargs['strict'] = True
 
-        argmap_kwargs.update({
-            'partial': False,  # fix missing=None not work
-            'only': only or None,
-            'context': {"request": request},
-        })
-        if tuple(LooseVersion(marshmallow.__version__).version)[0] < 3:
-            argmap_kwargs['strict'] = True
+    # partial=True is passed down to Nested schemas by marshmallow, limit it
+    # to top level fields so required fields of nested data are checked.
+    partial = argmap_kwargs.get('partial')
+    if partial is True or not partial:
+        partial = tuple(argmap.fields)
+    partial_schema = argmap.__class__(**dict(argmap_kwargs, partial=partial))
+    # fix missing=None not work
+    fallback_schema = argmap.__class__(**dict(argmap_kwargs, partial=False))
 
-        return argmap.__class__(**argmap_kwargs)
-
-    return base_use_kwargs(factory, **kwargs)
+    return base_use_kwargs(
+        parser.partial_load(partial_schema, fallback_schema), **kwargs)
 
 
 def import_subs(locals_, modules_only: bool = False) -> List[str]:
@@ -232,84 +252,540 @@ def import_subs(locals_, modules_only: bool = False) -> List[str]:
     return all_
 
 
+def _iter_batches(items: Iterable[Dict],
+                  batch_size: Union[int, Callable[[], int]]) \
+        -> Iterator[List[Dict]]:
+    """Consume any iterable in chunks of ``batch_size`` without holding
+    the whole input. ``batch_size`` can be a callable, asked before every
+    chunk.
+    """
+    iterator = iter(items)
+    while True:
+        batch = list(itertools.islice(
+            iterator, batch_size() if callable(batch_size) else batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+#: Max bind parameters per statement by dialect, used by
+#: ``bulk_create_or_update_on_duplicate(batch_size='auto')``.
+BIND_PARAMS_LIMITS = {
+    'sqlite': 32766 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999,
+    'postgresql': 65535,
+    'mysql': 65535,
+    'oracle': 65535,
+    'mssql': 2100,
+}
+
+
+class _AdaptiveBatchSize:
+    """Batch size tuned by observed per-batch latency, never bigger than
+    ``ceiling``. Call it to get current size.
+    """
+
+    def __init__(self, ceiling: int, initial: int = 500,
+                 target_seconds: float = 0.5):
+        self.ceiling = max(ceiling, 1)
+        self.size = min(initial, self.ceiling)
+        self.target_seconds = target_seconds
+        logger.info(f'bulk upsert adaptive batch_size={self.size}, '
+                    f'ceiling={self.ceiling}')
+
+    def __call__(self) -> int:
+        return self.size
+
+    def observe(self, rows: int, seconds: float) -> None:
+        if rows <= 0 or seconds <= 0:
+            return
+        ideal = self.target_seconds / (seconds / rows)
+        # move half way to ideal size to smooth out noisy batches
+        size = min(max(int((self.size + ideal) / 2), 1), self.ceiling)
+        if size != self.size:
+            logger.info(f'bulk upsert adaptive batch_size: {self.size} -> '
+                        f'{size} ({rows} rows in {seconds:.3f}s)')
+            self.size = size
+
+
+@functools.lru_cache(maxsize=None)
+def _get_upsert_columns(model_cls) -> Tuple[List[str], List[str]]:
+    """Unique keys and writable columns of model, computed once per model.
+    """
+    unique_keys = [c.name for i in model_cls.__table_args__ if isinstance(
+        i, UniqueConstraint) for c in i]
+    columns = [c.name for c in model_cls.__table__.columns if c.name not in (
+        'id', 'created_at')]
+    return unique_keys, columns
+
+
+def _upsert_on_conflict(insert):
+    def builder(table, fields, unique_keys):
+        stmt = insert(table)
+        return stmt.on_conflict_do_update(
+            index_elements=unique_keys,
+            set_={field: stmt.excluded[field] for field in fields
+                  if field not in unique_keys})
+    return builder
+
+
+def _upsert_on_duplicate_key(table, fields, unique_keys):
+    stmt = mysql.insert(table)
+    return stmt.on_duplicate_key_update({
+        field: stmt.inserted[field] for field in fields
+        if field not in unique_keys})
+
+
+#: Upsert statement builders used by ``bulk_create_or_update_on_duplicate``,
+#: keyed by dialect name. A builder is called with
+#: ``(table, fields, unique_keys)`` and returns an executable statement,
+#: register one here to support another db.
+UPSERT_STATEMENT_BUILDERS: Dict[str, Callable[..., Executable]] = {
+    'postgresql': _upsert_on_conflict(postgresql.insert),
+    'sqlite': _upsert_on_conflict(sqlite.insert),
+    'mysql': _upsert_on_duplicate_key,
+}
+
+
+@functools.lru_cache(maxsize=256)
+def _build_upsert_statement(model_cls, fields: Tuple[str, ...],
+                            dialect: str) -> Executable:
+    """Build upsert statement once per (model, fields, dialect).
+    """
+    if dialect not in UPSERT_STATEMENT_BUILDERS:
+        raise Exception(f'not support db: {dialect}')
+    unique_keys, _ = _get_upsert_columns(model_cls)
+    return UPSERT_STATEMENT_BUILDERS[dialect](
+        model_cls.__table__, fields, unique_keys)
+
+
+class _BulkProgress:
+    """Running totals of a bulk save, reported after every batch.
+    """
+
+    def __init__(self, model_cls, callback=None, batch_size=None):
+        self.model_cls = model_cls
+        self.callback = callback
+        self.batch_size = batch_size
+        self.batch = self.rowcount = self.items_count = 0
+
+    def update(self, batch_size: int, rowcount: int,
+               seconds: Optional[float] = None) -> None:
+        if seconds is not None and \
+                isinstance(self.batch_size, _AdaptiveBatchSize):
+            self.batch_size.observe(batch_size, seconds)
+        self.batch += 1
+        self.rowcount += rowcount
+        self.items_count += batch_size
+        logger.debug(f'{self.model_cls} save_data batch {self.batch}: '
+                     f'rowcount={self.rowcount}, '
+                     f'items_count: {self.items_count}')
+        if self.callback is not None:
+            self.callback({
+                'batch': self.batch, 'batch_size': batch_size,
+                'rowcount': self.rowcount, 'items_count': self.items_count,
+            })
+
+
+_COPY_ESCAPES = str.maketrans({
+    '\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+#: Python types which ``str()`` can not write as column value.
+_COPY_UNSUPPORTED_TYPES = (dict, list, tuple, set, bytes, bytearray)
+
+
+def _copy_text(value) -> str:
+    if isinstance(value, Enum):
+        return value.name
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, _COPY_UNSUPPORTED_TYPES):
+        raise Exception(f'not support copy value type: {type(value)}')
+    return str(value)
+
+
+def _copy_json(value) -> str:
+    return json.dumps(value)
+
+
+def _copy_bytea(value) -> str:
+    # PostgreSQL bytea hex format
+    return '\\x' + bytes(value).hex()
+
+
+def _copy_hex(value) -> str:
+    # MySQL, UNHEX-ed by LOAD DATA
+    return bytes(value).hex()
+
+
+def _is_binary(column) -> bool:
+    try:
+        return column.type.python_type is bytes
+    except NotImplementedError:
+        return False
+
+
+@functools.lru_cache(maxsize=256)
+def _get_copy_encoders(model_cls, fields: Tuple[str, ...], dialect: str) \
+        -> Tuple[Tuple[Callable[[Any], str], str], ...]:
+    """``(encode, null)`` of every field by column type, ``encode`` writes
+    a not None value as text, ``null`` is the text of None.
+    """
+    encoders = []
+    for field in fields:
+        column = model_cls.__table__.columns[field]
+        null = '\\N'
+        if isinstance(column.type, JSON):
+            encode = _copy_json
+            if not column.type.none_as_null:  # same as executemany
+                null = 'null'
+        elif _is_binary(column):
+            encode = _copy_bytea if dialect == 'postgresql' else _copy_hex
+        else:
+            encode = _copy_text
+        encoders.append((encode, null))
+    return tuple(encoders)
+
+
+def _copy_line(row: Dict, fields: Tuple[str, ...],
+               encoders: Tuple[Tuple[Callable[[Any], str], str], ...]) -> str:
+    """One row in the text format shared by PostgreSQL ``COPY`` and MySQL
+    ``LOAD DATA``: tab separated, ``\\N`` is NULL, backslash escaped.
+    Values are encoded by ``_get_copy_encoders``.
+    """
+    values = []
+    for field, (encode, null) in zip(fields, encoders):
+        value = row[field]
+        if value is None:
+            values.append(null)
+        else:
+            values.append(encode(value).translate(_COPY_ESCAPES))
+    return '\t'.join(values) + '\n'
+
+
+@functools.lru_cache(maxsize=256)
+def _build_copy_statements(model_cls, fields: Tuple[str, ...],
+                           dialect: str) -> Dict[str, TextClause]:
+    """Build staging table and merge statements once per
+    (model, fields, dialect).
+    """
+    table_name = model_cls.__tablename__
+    staging = f'_hobbit_staging_{table_name}'
+    unique_keys, _ = _get_upsert_columns(model_cls)
+    if dialect == 'postgresql':
+        columns = ", ".join(fields)
+        sql_on_update = ', '.join([
+            f' {field} = excluded.{field}'
+            for field in fields if field not in unique_keys])
+        return {
+            'create': text(
+                f'CREATE TEMP TABLE {staging} ON COMMIT DROP AS '
+                f'SELECT {columns} FROM {table_name} WITH NO DATA'),
+            'load': text(f'COPY {staging} ({columns}) FROM STDIN'),
+            'merge': text(
+                f"""INSERT INTO {table_name} ({columns})
+                SELECT {columns} FROM {staging}
+                ON CONFLICT ({", ".join(unique_keys)}) DO UPDATE SET
+                {sql_on_update}"""),
+            'drop': text(f'DROP TABLE {staging}'),
+        }
+    elif dialect == 'mysql':
+        columns = f'`{"`, `".join(fields)}`'
+        sql_on_update = ', '.join([
+            f' `{field}` = new.{field}' for field in fields
+            if field not in unique_keys])
+        # binary values are written as hex, loaded into variables to UNHEX
+        binaries = [field for field in fields
+                    if _is_binary(model_cls.__table__.columns[field])]
+        load_columns = ', '.join(
+            f'@{field}' if field in binaries else f'`{field}`'
+            for field in fields)
+        load_set = ' SET ' + ', '.join(
+            f'`{field}` = UNHEX(@{field})' for field in binaries) \
+            if binaries else ''
+        # temporary table survives rollback, drop it before create and
+        # after failed load, or the connection can not load again.
+        drop = text(f'DROP TEMPORARY TABLE IF EXISTS {staging}')
+        return {
+            'cleanup': drop,
+            'create': text(
+                f'CREATE TEMPORARY TABLE {staging} '
+                f'SELECT {columns} FROM {table_name} LIMIT 0'),
+            'load': text(
+                f'LOAD DATA LOCAL INFILE :path INTO TABLE {staging} '
+                f'CHARACTER SET utf8mb4 ({load_columns}){load_set}'),
+            'merge': text(
+                f"""INSERT INTO {table_name} ({columns})
+                SELECT * FROM (SELECT {columns} FROM {staging}) AS new
+                ON DUPLICATE KEY UPDATE
+                {sql_on_update}"""),
+            'drop': drop,
+        }
+    raise Exception(f'not support db: {dialect}')
+
+
+def _copy_upsert_postgresql(conn, stmts, fields, encoders, batches,
+                            progress):
+    cursor = conn.connection.cursor()
+    copy_sql = str(stmts['load'])
+    try:
+        for rows in batches:
+            data = ''.join(_copy_line(row, fields, encoders) for row in rows)
+            if hasattr(cursor, 'copy_expert'):  # psycopg2
+                cursor.copy_expert(copy_sql, io.StringIO(data))
+            else:  # psycopg 3
+                with cursor.copy(copy_sql) as copy:
+                    copy.write(data)
+            progress.update(len(rows), 0)
+    finally:
+        cursor.close()
+
+
+def _copy_upsert_mysql(conn, stmts, fields, encoders, batches, progress):
+    # Needs `local_infile` enabled on both client and server.
+    fd, path = tempfile.mkstemp(suffix='.tsv')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            for rows in batches:
+                f.writelines(
+                    _copy_line(row, fields, encoders) for row in rows)
+                progress.update(len(rows), 0)
+        conn.execute(stmts['load'], {'path': path})
+    finally:
+        os.remove(path)
+
+
+#: Dialects supported by ``bulk_create_or_update_on_duplicate(use_copy=True)``.
+_COPY_LOADERS = {
+    'postgresql': _copy_upsert_postgresql,
+    'mysql': _copy_upsert_mysql,
+}
+
+
+def _dedupe_by_unique_keys(rows: List[Dict],
+                           unique_keys: List[str]) -> List[Dict]:
+    """Keep the last row of every unique key in a batch. Multi-row
+    ``INSERT ... ON CONFLICT DO UPDATE`` (psycopg2 executemany is sent as
+    one statement) can not affect a row twice.
+    """
+    if not unique_keys:
+        return rows
+    latest = {tuple(row[k] for k in unique_keys): row for row in rows}
+    return rows if len(latest) == len(rows) else list(latest.values())
+
+
+def _bulk_serial_upsert(db, engine, stmt, batches, unique_keys, progress):
+    for rows in batches:
+        start = time.perf_counter()
+        try:
+            result = db.session.execute(
+                stmt, _dedupe_by_unique_keys(rows, unique_keys),
+                bind_arguments={'bind': engine},
+                execution_options={'preserve_rowcount': True})
+        except Exception as e:
+            logger.error(e, exc_info=True)
+            logger.info(stmt)
+            raise e
+        progress.update(
+            len(rows), result.rowcount, time.perf_counter() - start)
+
+
+def _bulk_parallel_upsert(engine, stmt, batches, unique_keys, batch_size,
+                          workers, max_in_flight, progress):
+    """Partition rows by unique key hash and execute each partition's
+    batches in order on it's own connection, so one key is always written
+    by the same worker.
+    """
+    def execute(rows):
+        start = time.perf_counter()
+        with engine.begin() as conn:
+            result = conn.execute(
+                stmt, _dedupe_by_unique_keys(rows, unique_keys),
+                execution_options={'preserve_rowcount': True})
+        return len(rows), result.rowcount, time.perf_counter() - start
+
+    executors = [ThreadPoolExecutor(max_workers=1) for _ in range(workers)]
+    partitions: List[List[Dict]] = [[] for _ in range(workers)]
+    pending: set = set()
+
+    def collect(return_when):
+        done, _ = wait(pending, return_when=return_when)
+        for future in done:
+            pending.discard(future)
+            progress.update(*future.result())
+
+    def submit(index):
+        while len(pending) >= max_in_flight:
+            collect(FIRST_COMPLETED)
+        rows, partitions[index] = partitions[index], []
+        pending.add(executors[index].submit(execute, rows))
+
+    try:
+        for rows in batches:
+            for row in rows:
+                index = hash(tuple(row[k] for k in unique_keys)) % workers
+                partitions[index].append(row)
+                if len(partitions[index]) >= (
+                        batch_size() if callable(batch_size) else batch_size):
+                    submit(index)
+        for index in range(workers):
+            if partitions[index]:
+                submit(index)
+        collect(ALL_COMPLETED)
+    finally:
+        for executor in executors:
+            executor.shutdown(wait=True)
+
+
+def _bulk_copy_upsert(db, engine, model_cls, fields, batches, progress):
+    """Stream rows into a temporary staging table, then merge with one
+    ``INSERT ... SELECT ... ON CONFLICT/ON DUPLICATE KEY UPDATE``.
+    """
+    stmts = _build_copy_statements(model_cls, fields, engine.name)
+    encoders = _get_copy_encoders(model_cls, fields, engine.name)
+    conn = db.session.connection(bind_arguments={'bind': engine})
+    cleanup = stmts.get('cleanup')
+    if cleanup is not None:
+        conn.execute(cleanup)
+    conn.execute(stmts['create'])
+    try:
+        _COPY_LOADERS[engine.name](
+            conn, stmts, fields, encoders, batches, progress)
+        rowcount = conn.execute(stmts['merge']).rowcount
+    except Exception:
+        if cleanup is not None:
+            try:
+                conn.execute(cleanup)
+            except Exception as e:
+                logger.error(e, exc_info=True)
+        raise
+    conn.execute(stmts['drop'])
+    return rowcount
+
+
 def bulk_create_or_update_on_duplicate(
-        db, model_cls, items, updated_at='updated_at', batch_size=500):
-    """ Support MySQL and postgreSQL.
+        db, model_cls, items, updated_at='updated_at', batch_size=500,
+        progress_callback: Optional[Callable[[Dict], Any]] = None,
+        use_copy: bool = False, workers: Optional[int] = None,
+        max_in_flight: Optional[int] = None):
+    """ Support MySQL, postgreSQL and SQLite, more dbs can be registered
+    in ``UPSERT_STATEMENT_BUILDERS``.
     https://dev.mysql.com/doc/refman/8.0/en/insert-on-duplicate.html
 
     Args:
 
         db: Instance of `SQLAlchemy`.
         model_cls: Model object.
-        items: List of data,[ example: `[{key: value}, {key: value}, ...]`.
+        items: Iterable of data, a list or a generator,
+            example: `[{key: value}, {key: value}, ...]`. Items are consumed
+            ``batch_size`` at a time and never modified in place. If a
+            unique key repeats in one batch, the last item wins.
         updated_at: Field which recording row update time.
-        batch_size: Batch size is max rows per execute.
+        batch_size: Batch size is max rows per execute. ``'auto'`` starts
+            from 500, never exceeds the bind parameters limit of the db
+            (``BIND_PARAMS_LIMITS`` divided by columns count) and is tuned
+            by observed per-batch latency.
+        progress_callback: Called after every batch with a dict contains
+            batch, batch_size, rowcount and items_count (running totals).
+        use_copy: Stream rows into a temporary staging table by
+            ``COPY FROM STDIN`` (postgreSQL) or ``LOAD DATA LOCAL INFILE``
+            (MySQL, needs ``local_infile``) and merge them by one
+            ``INSERT ... SELECT``. Much faster for large loads, but unique
+            keys must not repeat in items and rowcount is only known after
+            the merge. JSON and binary columns are encoded by column type,
+            other columns reject dict, list, tuple, set and bytes values.
+            Other dbs fall back to the default way. The copy is always
+            serial, can not be used with ``workers`` or ``max_in_flight``.
+        workers: Push batches concurrently over ``workers`` pooled
+            connections, rows are partitioned by unique keys hash. Every
+            batch is committed by it's own connection, **not** in
+            ``db.session``'s transaction. Not for in-memory SQLite.
+        max_in_flight: Max batches submitted but not finished when use
+            ``workers``, default is ``workers * 2``.
 
     Returns:
         dict: A dictionary contains rowcount and items_count.
+
+    The upsert statement is built once per (model, fields, dialect) and
+    reused, ``bulk_create_or_update_on_duplicate.cache_info()`` returns
+    it's hits and misses, ``cache_clear()`` resets it.
+
+    Examples::
+
+        def rows():
+            for line in open('data.csv'):
+                x, y, z = line.strip().split(',')
+                yield {'x': x, 'y': y, 'z': z}
+
+        bulk_create_or_update_on_duplicate(db, BulkModel, rows())
     """
-    if not items:
+    if use_copy and (workers is not None or max_in_flight is not None):
+        raise ValueError(
+            'use_copy can not be used with workers or max_in_flight')
+
+    iterator = iter(items)
+    first = next(iterator, None)
+    if first is None:
         logger.warning("bulk_create_or_update_on_duplicate save to "
                        f"{model_cls} failed, empty items")
         return {'rowcount': 0, 'items_count': 0}
 
-    items_count = len(items)
-    table_name = model_cls.__tablename__
-    fields = list(items[0].keys())
-    unique_keys = [c.name for i in model_cls.__table_args__ if isinstance(
-        i, UniqueConstraint) for c in i]
-    columns = [c.name for c in model_cls.__table__.columns if c.name not in (
-        'id', 'created_at')]
+    fields = list(first.keys())
+    unique_keys, columns = _get_upsert_columns(model_cls)
 
+    extra = {}
     if updated_at in columns and updated_at not in fields:
         fields.append(updated_at)
-        updated_at_time = datetime.datetime.now()
-        for item in items:
-            item[updated_at] = updated_at_time
+        extra[updated_at] = datetime.datetime.now()
 
     assert set(fields) == set(columns), \
         'item fields not equal to columns in models：new: ' + \
         f'{set(fields)-set(columns)}, delete: {set(columns)-set(fields)}'
 
-    for item in items:
+    def prepare(item):
+        row = dict(item, **extra)
         for column in unique_keys:
-            if column in item and item[column] is None:
-                item[column] = ''
+            if column in row and row[column] is None:
+                row[column] = ''
+        return row
 
     engine = db.get_engine(bind_key=getattr(model_cls, '__bind_key__', None))
-    if engine.name == 'postgresql':
-        sql_on_update = ', '.join([
-            f' {field} = excluded.{field}'
-            for field in fields if field not in unique_keys])
-        sql = f"""INSERT INTO {table_name} ({", ".join(fields)}) VALUES
-            ({", ".join([f':{key}' for key in fields])})
-            ON CONFLICT ({", ".join(unique_keys)}) DO UPDATE SET
-            {sql_on_update}"""
-    elif engine.name == 'mysql':
-        sql_on_update = '`, `'.join([
-            f' `{field}` = new.{field}' for field in fields
-            if field not in unique_keys])
-        sql = f"""INSERT INTO {table_name} (`{"`, `".join(fields)}`) VALUES
-            ({", ".join([f':{key}' for key in fields])}) AS new
-            ON DUPLICATE KEY UPDATE
-            {sql_on_update}"""
+    if batch_size == 'auto':
+        batch_size = _AdaptiveBatchSize(
+            BIND_PARAMS_LIMITS.get(engine.name, 999) // len(fields))
+
+    def prepared_batches():
+        for batch in _iter_batches(
+                itertools.chain([first], iterator), batch_size):
+            yield [prepare(item) for item in batch]
+
+    fields_key = tuple(sorted(fields))
+    progress = _BulkProgress(model_cls, progress_callback, batch_size)
+
+    if use_copy and engine.name in _COPY_LOADERS:
+        progress.rowcount = _bulk_copy_upsert(
+            db, engine, model_cls, fields_key, prepared_batches(), progress)
     else:
-        raise Exception(f'not support db: {engine.name}')
+        if use_copy:
+            logger.info(f'use_copy not support db: {engine.name}, '
+                        'fall back to executemany')
+        stmt = _build_upsert_statement(model_cls, fields_key, engine.name)
+        if workers and workers > 1:
+            _bulk_parallel_upsert(
+                engine, stmt, prepared_batches(), unique_keys, batch_size,
+                workers, max_in_flight or workers * 2, progress)
+        else:
+            _bulk_serial_upsert(
+                db, engine, stmt, prepared_batches(), unique_keys, progress)
 
-    rowcounts = 0
-    while len(items) > 0:
-        batch, items = items[:batch_size], items[batch_size:]
-        try:
-            result = db.session.execute(
-                text(sql), batch, bind_arguments={'bind': engine})
-        except Exception as e:
-            logger.error(e, exc_info=True)
-            logger.info(sql)
-            raise e
-        rowcounts += result.rowcount
-    logger.info(f'{model_cls} save_data: rowcount={rowcounts}, '
-                f'items_count: {items_count}')
-    return {'rowcount': rowcounts, 'items_count': items_count}
+    logger.info(f'{model_cls} save_data: rowcount={progress.rowcount}, '
+                f'items_count: {progress.items_count}')
+    return {'rowcount': progress.rowcount, 'items_count': progress.items_count}
+
+
+bulk_create_or_update_on_duplicate.cache_info = \
+    _build_upsert_statement.cache_info  # type: ignore
+bulk_create_or_update_on_duplicate.cache_clear = \
+    _build_upsert_statement.cache_clear  # type: ignore
 
 
 def get_env():
@@ -1,24 +1,137 @@
 from collections.abc import Mapping
+import weakref
 
 from webargs.flaskparser import FlaskParser
 
+_CONTAINERS = (Mapping, list, set)
+_SCALARS = frozenset({str, int, float, bool, type(None)})
 
-def strip_whitespace(value):
+
+def _is_container(value):
+    value_type = type(value)
+    return value_type is dict or value_type is list or (
+        value_type not in _SCALARS and isinstance(value, _CONTAINERS))
+
+
+def strip_whitespace(value, exclude=()):
+    """Strip all strings in value. Without recursion, containers are only
+    copied when something inside them changed, otherwise returned as is.
+
+    Args:
+        value: Data loaded from request.
+        exclude: Top-level keys of a mapping to keep untouched.
+    """
     if isinstance(value, str):
-        value = value.strip()
-    # you'll be getting a MultiDictProxy here potentially, but it should work
-    elif isinstance(value, Mapping):
-        return {k: strip_whitespace(value[k]) for k in value}
-    elif isinstance(value, (list, set)):
-        return type(value)(map(strip_whitespace, value))
-    return value
+        return value.strip()
+    if not _is_container(value):
+        return value
+
+    done = {}  # id(container) -> stripped container
+    stack = [(value, None)]
+    while stack:
+        node, items = stack.pop()
+        if items is None:
+            if id(node) in done:
+                continue
+            if type(node) is dict and not (node is value and exclude):
+                items, children = node.items(), node.values()
+            elif isinstance(node, Mapping):
+                # MultiDictProxy builds new lists per getitem, read it once
+                items = [(k, v) for k, v in node.items()
+                         if node is not value or k not in exclude]
+                children = [v for _, v in items]
+            else:
+                items = children = node
+            stack.append((node, items))
+            for v in children:
+                if _is_container(v):
+                    stack.append((v, None))
+            continue
+
+        changes = None
+        for k, v in items if isinstance(node, Mapping) else enumerate(items):
+            if type(v) is str:
+                new = v.strip()
+            elif _is_container(v):
+                new = done[id(v)]
+            else:
+                continue
+            if new is not v:
+                if changes is None:
+                    changes = {}
+                changes[k] = new
+
+        if changes is None:
+            done[id(node)] = node
+        elif isinstance(node, Mapping):
+            ret = {k: node[k] for k in node}
+            ret.update(changes)
+            done[id(node)] = ret
+        else:
+            ret = list(node)
+            for k, new in changes.items():
+                ret[k] = new
+            done[id(node)] = ret if type(node) is list else type(node)(ret)
+    return done[id(value)]
 
 
 class CustomParser(FlaskParser):
+    """FlaskParser which strip leading/trailing whitespace of all strings.
+
+    Stripping is skipped for ``strip_whitespace_exclude_locations`` and
+    for fields declared with ``metadata={'strip_whitespace': False}``::
+
+        parser.strip_whitespace_exclude_locations = {'files', 'headers'}
+
+        @use_kwargs({'password': fields.Str(
+            metadata={'strip_whitespace': False})})
+        def login(password):
+            pass
+    """
+
+    #: Locations that whitespace not stripped.
+    strip_whitespace_exclude_locations = frozenset({'files', 'headers'})
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._partial_fallbacks = weakref.WeakKeyDictionary()
+        self._strip_excludes = weakref.WeakKeyDictionary()
+
+    def partial_load(self, schema, fallback=None):
+        """Mark a ``partial`` schema to be loaded in partial mode: request is
+        loaded once and only supplied fields are returned. If nothing
+        supplied, load again by ``fallback`` (same schema without partial),
+        so ``load_default`` and ``required`` still work.
+
+        Returns:
+            marshmallow.Schema: The schema, use it as argmap.
+        """
+        self._partial_fallbacks[schema] = fallback
+        return schema
+
+    def _get_strip_excludes(self, schema):
+        if schema not in self._strip_excludes:
+            self._strip_excludes[schema] = frozenset(
+                field.data_key or name
+                for name, field in schema.fields.items()
+                if field.metadata.get('strip_whitespace') is False)
+        return self._strip_excludes[schema]
+
+    def _load_location_data(self, *, schema, req, location):
+        data = super()._load_location_data(
+            schema=schema, req=req, location=location)
+        if location in self.strip_whitespace_exclude_locations:
+            return data
+        return strip_whitespace(data, self._get_strip_excludes(schema))
 
-    def _load_location_data(self, **kwargs):
-        data = super()._load_location_data(**kwargs)
-        return strip_whitespace(data)
+    def _process_location_data(self, location_data, schema, *args, **kwargs):
+        data = super()._process_location_data(
+            location_data, schema, *args, **kwargs)
+        fallback = self._partial_fallbacks.get(schema)
+        if not data and fallback is not None:
+            data = super()._process_location_data(
+                location_data, fallback, *args, **kwargs)
+        return data
 
 
 parser = CustomParser()
@@ -60,7 +60,7 @@ setup(
             'flask-marshmallow>=1.0,<2',
             'Flask-Migrate>=4,<5',
             'flask-shell-ipython>=0.4.1',
-            'SQLAlchemy>=2.0,< 3',
+            'SQLAlchemy>=2.0.28,< 3',
             'Flask-SQLAlchemy>=3.0.0,<4',
             'marshmallow>=3.0.0,<4',
             'marshmallow-enum>=1.5.1,<2',
@@ -15,12 +15,14 @@ class BaseTest(object):
         with app.app_context():
             db.create_all(bind_key=None)
             db.create_all(bind_key='mysql')
+            db.create_all(bind_key='sqlite')
 
     @classmethod
     def teardown_class(cls):
         with app.app_context():
             db.drop_all(bind_key=None)
             db.drop_all(bind_key='mysql')
+            db.drop_all(bind_key='sqlite')
 
     def teardown_method(self, method):
         with app.app_context():
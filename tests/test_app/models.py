@@ -1,5 +1,6 @@
 # -*- encoding: utf-8 -*-
-from sqlalchemy import UniqueConstraint, func, DateTime, BigInteger
+from sqlalchemy import UniqueConstraint, func, DateTime, BigInteger, \
+    Integer
 from flask_sqlalchemy.track_modifications import models_committed
 
 from hobbit_core.db import Column, BaseModel, EnumExt
@@ -41,6 +42,16 @@ class Role(BaseModel):  # just for assert multi model worked
     name = Column(db.String(50), nullable=False, unique=True)
 
 
+class Post(BaseModel):
+    title = Column(db.String(50), nullable=False)
+    content = Column(db.Text)
+    user_id = Column(db.Integer, nullable=False)
+
+    user = db.relationship(
+        User, primaryjoin='foreign(Post.user_id) == User.id',
+        backref=db.backref('posts', order_by='Post.id'))
+
+
 class BulkModelMixin:
     x = Column(db.String(50), nullable=False)
     y = Column(db.String(50), nullable=False)
@@ -79,3 +90,13 @@ class BulkModelMysql(BaseModel, BulkModelMixin):
 
 class BulkModel2Mysql(db.Model, BulkModel2Mixin):
     __bind_key__ = 'mysql'
+
+
+class BulkModelSqlite(BaseModel, BulkModelMixin):
+    __bind_key__ = 'sqlite'
+
+
+class BulkModel2Sqlite(db.Model, BulkModel2Mixin):
+    __bind_key__ = 'sqlite'
+
+    id = Column(BigInteger().with_variant(Integer, 'sqlite'), primary_key=True)
@@ -1,8 +1,8 @@
-from hobbit_core.schemas import ORMSchema, SchemaMixin
+from hobbit_core.schemas import ORMSchema, SchemaMixin, PagedSchema
 
 from marshmallow import fields
 
-from .models import User
+from .models import User, Post
 
 
 class UserSchema(ORMSchema, SchemaMixin):
@@ -10,3 +10,15 @@ class UserSchema(ORMSchema, SchemaMixin):
 
     class Meta:
         model = User
+
+
+class PostSchema(ORMSchema, SchemaMixin):
+    user = fields.Nested('UserSchema', only=['id', 'username'])
+
+    class Meta:
+        model = Post
+        exclude = ['content']
+
+
+class PagedPostSchema(PagedSchema):
+    items = fields.Nested(PostSchema, many=True)
@@ -5,6 +5,7 @@ from webargs.flaskparser import use_kwargs as base_use_kwargs
 
 from hobbit_core.utils import use_kwargs
 from hobbit_core.db import transaction
+from hobbit_core.response import enum_options_response, StreamingResult
 
 from .schemas import UserSchema
 from .exts import db
@@ -63,3 +64,15 @@ def create_user_success(email):
 
     create_user()
     return jsonify({})
+
+
+@bp.route('/options/', methods=['GET'])
+def options():
+    return enum_options_response('tests.test_app.models')
+
+
+@bp.route('/stream_users/', methods=['GET'])
+def stream_users():
+    return StreamingResult(
+        User.query.order_by(User.id), dump=UserSchema(only=['username']).dump,
+        chunk_size=2)
@@ -4,11 +4,11 @@ import random
 
 from sqlalchemy.exc import InvalidRequestError
 
-from hobbit_core.db import EnumExt, transaction
+from hobbit_core.db import EnumExt, enum_registry, transaction
 from hobbit_core.db import BaseModel, Column
 
 from .test_app.exts import db
-from .test_app.models import User
+from .test_app.models import User, RoleEnum
 
 from . import BaseTest
 
@@ -85,6 +85,11 @@ class TestEnumExt(BaseTest):
                 CREATED = (0, u'新建')
                 FINISHED = (0, u'已完成')
 
+        with pytest.raises(ValueError, match=msg):
+            class ErrValueEnum(EnumExt):
+                CREATED = (0, u'新建')
+                FINISHED = (1, u'新建')
+
     @pytest.fixture
     def TaskState(self):
         class _TaskState(EnumExt):
@@ -104,6 +109,7 @@ class TestEnumExt(BaseTest):
         assert 'FINISHED' == TaskState.load(1)
         assert 'CREATED' == TaskState.load(u'新建')
         assert TaskState.load(100) is None
+        assert TaskState.load(u'不存在') is None
 
     def test_to_opts(self, TaskState):
         opts = TaskState.to_opts()
@@ -117,6 +123,37 @@ class TestEnumExt(BaseTest):
             {'key': 1, 'label': 'FINISHED', 'value': u'已完成'},
         ]
 
+        opts.pop()
+        assert len(TaskState.to_opts(verbose=True)) == 2
+
+        opts[0]['disabled'] = True
+        assert TaskState.to_opts(verbose=True)[0] == {
+            'key': 0, 'label': 'CREATED', 'value': u'新建'}
+        TaskState.to_opts()[0]['key'] = 3
+        assert TaskState.to_opts()[0]['key'] == 0
+
+    def test_enum_registry(self, TaskState):
+        assert enum_registry['tests.test_app.models.RoleEnum'] is RoleEnum
+        assert EnumExt not in enum_registry.values()
+        assert enum_registry.options('tests.test_app') == {
+            'RoleEnum': RoleEnum.to_opts(verbose=True)}
+        enum_registry.options('tests.test_app')['RoleEnum'][0]['key'] = 3
+        assert enum_registry.options('tests.test_app')['RoleEnum'][0][
+            'key'] == 1
+
+        payload, etag = enum_registry.encoded_options('tests.test_app')
+        assert enum_registry.encoded_options('tests.test_app') == (
+            payload, etag)
+
+        version = enum_registry.version
+
+        class OtherEnum(EnumExt):
+            A = (1, 'a')
+
+        assert enum_registry.version == version + 1
+        assert enum_registry.options('tests')['OtherEnum'] == \
+            OtherEnum.to_opts(verbose=True)
+
 
 class TestTransaction(BaseTest):
 
@@ -1,9 +1,12 @@
 import json
 
+import pytest
 from sqlalchemy.orm import exc as orm_exc
 from werkzeug import exceptions as wkz_exc
 
-from hobbit_core.err_handler import ErrHandler, HobbitException
+from hobbit_core.err_handler import ErrHandler, HobbitException, \
+    _resolve_handler
+from hobbit_core.response import FailedResult
 
 from . import BaseTest
 
@@ -50,3 +53,65 @@ class TestErrHandler(BaseTest):
         # py27,py36 == "Exception('msg',)"
         # py37 == "Exception('msg')"
         assert data['detail'].startswith("Exception('msg'")
+
+    def test_subclass_exception(self, app):
+        class CustomException(HobbitException):
+            pass
+
+        resp = ErrHandler.handler(CustomException('msg'))
+        assert resp.status_code == 400
+        assert json.loads(resp.get_data())['message'] == 'msg'
+
+        resp = ErrHandler.handler(wkz_exc.NotFound())
+        assert resp.status_code == 404
+
+
+class TestErrHandlerRegister(BaseTest):
+
+    @pytest.fixture
+    def MyErrHandler(self):
+        class MyErrHandler(ErrHandler):
+            @classmethod
+            def handler_hobbit_core_err_handler(cls, e):
+                return FailedResult(code=1, message='custom')
+
+        return MyErrHandler
+
+    def test_register(self, app, MyErrHandler):
+        class PaymentError(Exception):
+            pass
+
+        class CardError(PaymentError):
+            pass
+
+        @MyErrHandler.register(PaymentError)
+        def handle_payment_error(e):
+            return FailedResult(code=2, message=str(e))
+
+        for exc in (PaymentError('pay'), CardError('card')):
+            resp = MyErrHandler.handler(exc)
+            assert json.loads(resp.get_data())['message'] == str(exc)
+
+        # registered on subclass only
+        assert ErrHandler.handler(CardError('card')).status_code == 500
+        assert PaymentError not in ErrHandler._registry
+
+        resp = MyErrHandler.handler(HobbitException('msg'))
+        assert json.loads(resp.get_data())['message'] == 'custom'
+        resp = MyErrHandler.handler(AssertionError('msg'))
+        assert resp.status_code == 422
+
+        @MyErrHandler.register(AssertionError)
+        def handle_assertion_error(e):
+            return FailedResult(code=3, message='assertion')
+
+        resp = MyErrHandler.handler(AssertionError('msg'))
+        assert json.loads(resp.get_data())['message'] == 'assertion'
+        assert ErrHandler.handler(AssertionError('msg')).status_code == 422
+
+    def test_dispatch_cached(self, app):
+        _resolve_handler.cache_clear()
+        for _ in range(3):
+            ErrHandler.handler(wkz_exc.Forbidden())
+        info = _resolve_handler.cache_info()
+        assert (info.misses, info.hits) == (1, 2)
@@ -1,14 +1,34 @@
+import base64
+
 import pytest
 
+from sqlalchemy import event
+from sqlalchemy.orm.attributes import instance_state
 from webargs.core import ValidationError
 
-from hobbit_core.pagination import PageParams, pagination
+from hobbit_core.err_handler import HobbitException
+from marshmallow import fields
+
+from hobbit_core import pagination as pagination_mod
+from hobbit_core.pagination import PageParams, pagination, CursorParams, \
+    cursor_pagination, count_cache, get_order_by_map, model_page_params, \
+    get_projection
 
 from . import BaseTest
-from .test_app.models import User
+from .test_app.models import User, Post, RoleEnum
+from .test_app.schemas import PostSchema, PagedPostSchema
 from .test_app.exts import db
 
 
+@pytest.fixture
+def users():
+    users = [User(username=f'test{i}', email=f'{i}@b.com',
+                  password=f'{i % 3}') for i in range(7)]
+    db.session.add_all(users)
+    db.session.commit()
+    return [u.id for u in users]
+
+
 class TestPagination(BaseTest):
 
     def test_page_params(self, web_request, parser):
@@ -39,6 +59,33 @@ class TestPagination(BaseTest):
         web_request.query = {'order_by': ''}
         assert viewfunc() == {'order_by': [], 'page': 1, 'page_size': 10}
 
+    def test_model_page_params(self, web_request, parser):
+        @parser.use_kwargs(model_page_params(User), web_request,
+                           location='query')
+        def viewfunc(page, page_size, order_by):
+            return {'page': page, 'page_size': page_size, 'order_by': order_by}
+
+        assert viewfunc() == {'order_by': ['-id'], 'page': 1, 'page_size': 10}
+
+        web_request.query = {'order_by': 'role,-username'}
+        assert viewfunc()['order_by'] == ['role', '-username']
+
+        web_request.query = {'order_by': 'id,-aaa'}
+        msg = r".*order_by': .*Column `-aaa` not exist in User.*"
+        with pytest.raises(ValidationError, match=msg):
+            viewfunc()
+
+        params = model_page_params(User, CursorParams)
+        assert sorted(params) == ['cursor', 'order_by', 'page_size']
+
+    def test_get_order_by_map(self):
+        order_map = get_order_by_map(User)
+        assert get_order_by_map(User) is order_map
+        assert order_map['id'] is User.id
+        assert str(order_map['-username']) == str(User.username.desc())
+        assert set(order_map) == {
+            f'{d}{c.name}' for c in User.__table__.columns for d in ('', '-')}
+
     def test_pagination(self, client):
         user1 = User(username='test1', email='1@b.com', password='1')
         user2 = User(username='test2', email='1@a.com', password='1')
@@ -73,3 +120,274 @@ class TestPagination(BaseTest):
         with pytest.raises(Exception, match=msg):
             pagination(User, 1, 10, order_by='roles')
         db.session.commit()
+
+    @pytest.mark.parametrize('count', ['exact', 'cached', 'estimate', None])
+    def test_pagination_count(self, users, count):
+        def page(page, query_exp=None):
+            resp = pagination(User, page, 5, order_by='id', count=count,
+                              query_exp=query_exp)
+            return [i.id for i in resp['items']], resp['total'], \
+                resp['has_next']
+
+        items, total, has_next = page(1)
+        assert (items, has_next) == (users[:5], True)
+        if count == 'estimate':  # planner estimate, never below rows seen
+            assert total >= 6
+        else:
+            assert total == (7 if count else None)
+        assert page(2) == (users[5:], 7, False)
+        assert page(3)[0] == []
+
+        query_exp = User.query.filter(User.password == '0')
+        assert page(1, query_exp) == ([users[0], users[3], users[6]], 3, False)
+
+    def test_pagination_cached_count(self, users, monkeypatch):
+        count_cache.clear()
+        assert pagination(User, 1, 5, count='cached')['total'] == 7
+        db.session.add(User(username='new', email='new', password='1'))
+        db.session.commit()
+        assert pagination(User, 1, 5, count='cached')['total'] == 7
+        assert pagination(User, 1, 5)['total'] == 8
+
+        query_exp = User.query.filter(User.password == '1')
+        assert pagination(User, 1, 2, count='cached',
+                          query_exp=query_exp)['total'] == 3
+
+        monkeypatch.setattr(pagination_mod.time, 'monotonic',
+                            lambda: float('inf'))
+        assert pagination(User, 1, 5, count='cached')['total'] == 8
+
+    def test_pagination_estimate_fallback(self, users, monkeypatch):
+        def estimator(obj, qexp, bind):
+            raise Exception('estimate failed')
+
+        for dialect in ('postgresql', 'mysql', 'sqlite', 'oracle'):
+            monkeypatch.setitem(
+                pagination_mod.COUNT_ESTIMATORS, dialect, estimator)
+        assert pagination(User, 1, 5, count='estimate')['total'] == 7
+
+        with pytest.raises(Exception, match='not support count: fast'):
+            pagination(User, 1, 5, count='fast')
+
+
+class TestPaginationProjection(BaseTest):
+
+    @pytest.fixture
+    def statements(self, app):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute',
+                         before_cursor_execute)
+            yield statements
+            event.remove(db.engine, 'before_cursor_execute',
+                         before_cursor_execute)
+
+    @pytest.fixture
+    def posts(self):
+        users = [User(username=f'test{i}', email=f'{i}@b.com', password='1')
+                 for i in range(3)]
+        db.session.add_all(users)
+        db.session.flush()
+        db.session.add_all([
+            Post(title=f'title{i}', content='x' * 100,
+                 user_id=users[i % 3].id) for i in range(6)])
+        db.session.commit()
+        db.session.expunge_all()
+
+    def get_statements(self, statements):
+        posts_sql = [i for i in statements if i.startswith('SELECT post.')]
+        users_sql = [i for i in statements if 'FROM user' in i]
+        return posts_sql, users_sql
+
+    @pytest.mark.parametrize('schema', [
+        PostSchema(), PostSchema, PagedPostSchema()])
+    def test_pagination_schema(self, posts, statements, schema):
+        resp = pagination(Post, 1, 4, order_by='id', schema=schema)
+        posts_sql, users_sql = self.get_statements(statements)
+        assert len(posts_sql) == 1 and 'content' not in posts_sql[0]
+        assert len(users_sql) == 1 and 'email' not in users_sql[0]
+        assert 'content' in instance_state(resp['items'][0]).unloaded
+
+        count = len(statements)
+        data = PostSchema(many=True).dump(resp['items'])
+        assert len(statements) == count  # no lazy load when dump
+        assert [i['user']['username'] for i in data] == [
+            'test0', 'test1', 'test2', 'test0']
+
+    def test_pagination_fields(self, posts, statements):
+        resp = pagination(Post, 1, 4, schema=['title', 'user.username'])
+        posts_sql, users_sql = self.get_statements(statements)
+        assert 'created_at' not in posts_sql[0]
+        assert 'email' not in users_sql[0]
+        assert [i.user.username for i in resp['items']] == [
+            'test0', 'test1', 'test2', 'test0']
+
+        statements.clear()
+        resp = pagination(Post, 1, 4, schema=['id', 'user'])
+        posts_sql, users_sql = self.get_statements(statements)
+        assert 'content' not in posts_sql[0]
+        assert 'email' in users_sql[0]
+
+    def test_pagination_schema_load_all(self, posts, statements):
+        class MethodSchema(PostSchema):
+            summary = fields.Method('get_summary')
+
+            def get_summary(self, obj):
+                return obj.content[:10]
+
+        pagination(Post, 1, 4, schema=MethodSchema())
+        posts_sql, _ = self.get_statements(statements)
+        assert 'content' in posts_sql[0]
+
+    def test_projection_cache(self, monkeypatch):
+        inits, calls = [], []
+
+        class CountedPagedPostSchema(PagedPostSchema):
+            def __init__(self, *args, **kwargs):
+                inits.append(kwargs)
+                super().__init__(*args, **kwargs)
+
+        get_schema_projection = pagination_mod._get_schema_projection
+        monkeypatch.setattr(
+            pagination_mod, '_get_schema_projection',
+            lambda schema, depth=0: calls.append(depth) or
+            get_schema_projection(schema, depth))
+
+        projection = get_projection(CountedPagedPostSchema)
+        assert get_projection(CountedPagedPostSchema) is projection
+        assert len(inits) == 1 and calls.count(0) == 1
+        assert dict(projection)['user'] == (('id', None), ('username', None))
+
+        get_projection(PostSchema(exclude=['user']))
+        assert get_projection(PostSchema(exclude=['user'])) == (
+            get_projection(PostSchema(exclude=('user', ))))
+        assert calls.count(0) == 2
+        assert 'user' not in dict(get_projection(PostSchema(
+            exclude=['user'])))
+
+    def test_cursor_pagination_schema(self, posts, statements):
+        resp = cursor_pagination(Post, None, 4, '-title', schema=['user'])
+        posts_sql, _ = self.get_statements(statements)
+        assert 'content' not in posts_sql[0]
+        resp = cursor_pagination(
+            Post, resp['next_cursor'], 4, '-title', schema=['user'])
+        assert [i.title for i in resp['items']] == ['title1', 'title0']
+
+
+class TestCursorPagination(BaseTest):
+
+    def walk(self, order_by, page_size=3):
+        ids, pages, cursor = [], [], None
+        while True:
+            resp = cursor_pagination(User, cursor, page_size, order_by)
+            pages.append(resp)
+            ids.extend(i.id for i in resp['items'])
+            cursor = resp['next_cursor']
+            if cursor is None:
+                return ids, pages
+
+    @pytest.mark.parametrize('order_by', [
+        'id', '-id', ['password', '-email'], ['-role', 'password'], None])
+    def test_cursor_pagination(self, users, order_by):
+        expected = [i.id for i in pagination(
+            User, 1, 100, order_by=order_by or 'id')['items']]
+        ids, pages = self.walk(order_by)
+        assert ids == expected
+        assert [len(p['items']) for p in pages] == [3, 3, 1]
+        assert pages[0]['prev_cursor'] is None
+
+        # walk back from last page
+        resp = cursor_pagination(
+            User, pages[-1]['prev_cursor'], 3, order_by)
+        assert [i.id for i in resp['items']] == expected[3:6]
+        resp = cursor_pagination(User, resp['prev_cursor'], 3, order_by)
+        assert [i.id for i in resp['items']] == expected[:3]
+        assert resp['prev_cursor'] is None
+        assert resp['next_cursor'] == pages[0]['next_cursor']
+
+    @pytest.mark.parametrize('order_by', [['role'], ['-role']])
+    def test_cursor_pagination_nullable(self, order_by):
+        roles = [None, RoleEnum.normal, None, RoleEnum.admin, None,
+                 RoleEnum.normal, RoleEnum.admin]
+        users = [User(username=f'test{i}', email=f'{i}@b.com', password='1',
+                      role=role) for i, role in enumerate(roles)]
+        db.session.add_all(users)
+        db.session.commit()
+        # column default replaces None when insert
+        User.query.filter(User.id.in_([
+            u.id for u, role in zip(users, roles) if role is None
+        ])).update({'role': None})
+        db.session.commit()
+        assert User.query.filter(User.role.is_(None)).count() == 3
+
+        # NULL is greater than values
+        expected = [u.id for u in sorted(users, key=lambda u: (
+            u.role is None, u.role.name if u.role else '', u.id))]
+        if order_by == ['-role']:
+            expected.reverse()
+
+        ids, pages = self.walk(order_by, page_size=2)
+        assert ids == expected
+        assert [len(p['items']) for p in pages] == [2, 2, 2, 1]
+
+        ids, cursor = [], pages[-1]['prev_cursor']
+        while cursor is not None:
+            resp = cursor_pagination(User, cursor, 2, order_by)
+            ids[:0] = [i.id for i in resp['items']]
+            cursor = resp['prev_cursor']
+        assert ids == expected[:6]
+
+    def test_cursor_pagination_query_exp(self, users):
+        query_exp = User.query.filter(User.password == '0')
+        resp = cursor_pagination(User, None, 2, 'id', query_exp=query_exp)
+        resp = cursor_pagination(
+            User, resp['next_cursor'], 2, 'id', query_exp=query_exp)
+        assert [i.id for i in resp['items']] == [users[6]]
+        assert resp['next_cursor'] is None
+
+    def test_invalid_cursor(self, users):
+        resp = cursor_pagination(User, None, 5, '-id')
+        with pytest.raises(HobbitException, match='cursor not match'):
+            cursor_pagination(User, resp['next_cursor'], 5, 'email')
+        with pytest.raises(HobbitException, match='invalid cursor'):
+            cursor_pagination(User, 'abc', 5, '-id')
+        for payload in (b'[1]', b'{"k": ["id"]}', b'{"v": 1}', b'"v"'):
+            cursor = base64.urlsafe_b64encode(payload).decode()
+            with pytest.raises(HobbitException, match='invalid cursor'):
+                cursor_pagination(User, cursor, 5, '-id')
+
+    @pytest.mark.parametrize('order_by, values', [
+        (['-id'], ['1']), (['-id'], [[1]]), (['-id'], [{'a': 1}]),
+        (['-id'], [True]), (['-id'], [None]), (['-id'], [1.5]),
+        (['email'], [1, 1]), (['email'], [['a'], 1]),
+        (['role'], ['unknown', 1]), (['role'], [1, 1]),
+        (['role'], [['admin'], 1]),
+        (['created_at'], ['2024-13-01T00:00:00', 1]),
+        (['created_at'], [20240101, 1]),
+    ])
+    def test_tampered_cursor_value(self, users, order_by, values):
+        names = [i.lstrip('-') for i in order_by]
+        if 'id' not in names:
+            names.append('id')
+        cursor = pagination_mod.encode_cursor(values, keys=names)
+        with pytest.raises(HobbitException, match='invalid cursor'):
+            cursor_pagination(User, cursor, 5, order_by)
+
+        # valid values of the same columns
+        valid = {'id': users[0], 'email': '0@b.com', 'role': 'admin',
+                 'created_at': '2024-01-01T00:00:00'}
+        cursor = pagination_mod.encode_cursor(
+            [valid[name] for name in names], keys=names)
+        cursor_pagination(User, cursor, 5, order_by)
+
+    def test_cursor_params(self, web_request, parser):
+        @parser.use_kwargs(CursorParams, web_request, location='query')
+        def viewfunc(**kwargs):
+            return kwargs
+
+        assert viewfunc() == {
+            'cursor': None, 'order_by': ['-id'], 'page_size': 10}
@@ -1,11 +1,25 @@
 # -*- encoding: utf-8 -*-
+import dataclasses
+import datetime
+import decimal
+import json
+import uuid
+
 import pytest
+from flask import Flask
+from werkzeug import exceptions as wkz_exc
+
+from hobbit_core.err_handler import ErrHandler
 
 from hobbit_core.response import gen_response, Result, \
     SuccessResult, FailedResult, UnauthorizedResult, ForbiddenResult, \
-    ValidationErrorResult, ServerErrorResult
+    ValidationErrorResult, ServerErrorResult, JSON_SERIALIZERS, \
+    get_json_serializer, reload_response_settings, get_response_settings, \
+    StreamingResult
 
 from . import BaseTest
+from .test_app.exts import db
+from .test_app.models import RoleEnum, User
 
 
 class TestResponse(BaseTest):
@@ -37,7 +51,7 @@ class TestResponse(BaseTest):
 
     def test_success_result(self, app):
         # assert status can rewrite
-        excepted = b'{\n"code":"200",\n"data":null,\n"detail":null,\n"message":"message"\n}\n'  # NOQA
+        excepted = b'{"code":"200","message":"message","data":null,"detail":null}\n'  # NOQA
         result = SuccessResult('message', status=301)
         assert result.status_code == 301
         assert excepted == result.data
@@ -47,28 +61,35 @@ class TestResponse(BaseTest):
         assert result.status_code == 200
 
         app.config['HOBBIT_USE_CODE_ORIGIN_TYPE'] = True
+        reload_response_settings(app)
         result = SuccessResult(code=0)
         assert b'"code":0' in result.data
 
         app.config['HOBBIT_USE_CODE_ORIGIN_TYPE'] = False
+        reload_response_settings(app)
         result = SuccessResult(code=0)
         assert b'"code":"0"' in result.data
 
         app.config['HOBBIT_RESPONSE_MESSAGE_MAPS'] = {100: 'testmsg'}
+        reload_response_settings(app)
         result = SuccessResult(code=100)
         assert b'"message":"testmsg"' in result.data
         app.config['HOBBIT_RESPONSE_MESSAGE_MAPS'] = {}
+        reload_response_settings(app)
 
     def test_500_result(self, app):
         result = ServerErrorResult('message', detail='detail')
         assert result.status_code == 500
-        excepted = b'{\n"code":"500",\n"data":null,\n"detail":"detail",\n"message":"message"\n}\n'  # NOQA
+        excepted = b'{"code":"500","message":"message","data":null,"detail":"detail"}\n'  # NOQA
         assert excepted == result.data
 
         app.config['HOBBIT_RESPONSE_DETAIL'] = False
+        reload_response_settings(app)
         result = ServerErrorResult('message', detail='detail')
-        excepted = b'{\n"code":"500",\n"data":null,\n"detail":null,\n"message":"message"\n}\n'  # NOQA
+        excepted = b'{"code":"500","message":"message","data":null,"detail":null}\n'  # NOQA
         assert excepted == result.data
+        app.config['HOBBIT_RESPONSE_DETAIL'] = True
+        reload_response_settings(app)
 
     def test_failed_result(self):
         result = FailedResult()
@@ -82,3 +103,200 @@ class TestResponse(BaseTest):
     ])
     def test_results(self, result, excepted_status):
         assert result().status_code == excepted_status
+
+
+@pytest.fixture
+def set_config(app, monkeypatch):
+    def setter(key, value):
+        monkeypatch.setitem(app.config, key, value)
+        return reload_response_settings(app)
+
+    yield setter
+    monkeypatch.undo()
+    reload_response_settings(app)
+
+
+class TestResponseSettings(BaseTest):
+
+    def test_settings_frozen(self, app, set_config, monkeypatch):
+        settings = get_response_settings()
+        assert app.extensions['hobbit_core.response'] is settings
+
+        monkeypatch.setitem(
+            app.config, 'HOBBIT_RESPONSE_MESSAGE_MAPS', {200: 'success'})
+        assert gen_response(200)['message'] == 'ok'
+        assert get_response_settings() is settings
+
+        settings = set_config(
+            'HOBBIT_RESPONSE_MESSAGE_MAPS', {200: 'success', 404: None})
+        assert get_response_settings() is settings
+        assert gen_response(200)['message'] == 'success'
+        assert gen_response(404)['message'] == '不正确的链接地址'
+        assert gen_response(1)['message'] == 'unknown'
+
+        msg = 'HOBBIT_RESPONSE_MESSAGE_MAPS must be dict type.'
+        with pytest.raises(AssertionError, match=msg):
+            set_config('HOBBIT_RESPONSE_MESSAGE_MAPS', [])
+
+    def test_settings_without_hobbit_manager(self):
+        other_app = Flask(__name__)
+        other_app.config['HOBBIT_USE_CODE_ORIGIN_TYPE'] = True
+        with other_app.app_context():
+            assert gen_response(200)['code'] == 200
+            other_app.config['HOBBIT_USE_CODE_ORIGIN_TYPE'] = False
+            assert gen_response(200)['code'] == '200'
+
+
+class TestEncodedResult(BaseTest):
+
+    @pytest.mark.parametrize('result, excepted_status', [
+        (SuccessResult, 200),
+        (FailedResult, 400),
+        (UnauthorizedResult, 401),
+        (ForbiddenResult, 403),
+        (ValidationErrorResult, 422),
+        (ServerErrorResult, 500),
+    ])
+    def test_encoded(self, app, result, excepted_status):
+        settings = get_response_settings()
+        body = result().get_data()
+        assert settings.encoded[(result, excepted_status, '')] == body
+        assert result().status_code == excepted_status
+        assert json.loads(body) == gen_response(excepted_status)
+
+        # not argument-free
+        assert result('msg').json['message'] == 'msg'
+        assert result(code=1).json['code'] == '1'
+        assert result(detail='detail').json['detail'] in ('detail', None)
+        assert len([k for k in settings.encoded if k[0] is result]) == 1
+
+    def test_encoded_reload(self, app, set_config):
+        assert SuccessResult().json['message'] == 'ok'
+        settings = set_config('HOBBIT_RESPONSE_MESSAGE_MAPS', {200: '成功'})
+        assert settings.encoded == {}
+        assert SuccessResult().json['message'] == '成功'
+        assert SuccessResult(status=201).status_code == 201
+        assert list(settings.encoded) == [(SuccessResult, 200, '')]
+
+    def test_encoded_err_handler(self, app):
+        resp = ErrHandler.handler(wkz_exc.NotFound())
+        assert resp.status_code == 404
+        assert resp.json == gen_response(404, '不正确的链接地址')
+        assert (Result, 404, '不正确的链接地址') in \
+            get_response_settings().encoded
+
+
+class TestJsonSerializer(BaseTest):
+
+    @dataclasses.dataclass
+    class Point:
+        x: int
+        y: int
+
+    @pytest.fixture
+    def data(self):
+        return {
+            'datetime': datetime.datetime(2024, 1, 2, 3, 4, 5),
+            'date': datetime.date(2024, 1, 2),
+            'time': datetime.time(3, 4, 5),
+            'decimal': decimal.Decimal('1.10'),
+            'uuid': uuid.UUID('12345678123456781234567812345678'),
+            'enum': RoleEnum.admin,
+            'point': self.Point(1, 2),
+            'int_key': {1: 'a'},
+            'text': '中文',
+            'list': [1, 2.5, None, True],
+        }
+
+    @pytest.mark.parametrize('name', ['json', 'orjson', 'auto'])
+    def test_serializers(self, app, data, name, set_config):
+        if name == 'orjson':
+            pytest.importorskip('orjson')
+        set_config('HOBBIT_JSON_SERIALIZER', name)
+        result = SuccessResult(data=data)
+        assert result.data.endswith(b'}\n') and b'\n' not in result.data[:-1]
+        assert result.json['data'] == {
+            'datetime': 'Tue, 02 Jan 2024 03:04:05 GMT',
+            'date': 'Tue, 02 Jan 2024 00:00:00 GMT',
+            'time': '03:04:05',
+            'decimal': '1.10',
+            'uuid': '12345678-1234-5678-1234-567812345678',
+            'enum': [1, '管理员'],
+            'point': {'x': 1, 'y': 2},
+            'int_key': {'1': 'a'},
+            'text': '中文',
+            'list': [1, 2.5, None, True],
+        }
+        assert result.data == JSON_SERIALIZERS['json'](
+            gen_response(200, data=data)) + b'\n'
+
+    def test_flask_serializer(self, app, set_config):
+        set_config('HOBBIT_JSON_SERIALIZER', 'flask')
+        result = SuccessResult('message')
+        excepted = b'{\n"code":"200",\n"data":null,\n"detail":null,\n"message":"message"\n}\n'  # NOQA
+        assert excepted == result.data
+
+    def test_not_support(self, app, set_config):
+        with pytest.raises(Exception, match='not support json serializer'):
+            set_config('HOBBIT_JSON_SERIALIZER', 'ujson')
+
+        with pytest.raises(TypeError, match='not JSON serializable'):
+            get_json_serializer('json')(object())
+
+
+class TestStreamingResult(BaseTest):
+
+    @pytest.mark.parametrize('name', ['json', 'flask', 'auto'])
+    @pytest.mark.parametrize('count', [0, 1, 5, 6])
+    def test_streaming_result(self, app, set_config, name, count):
+        set_config('HOBBIT_JSON_SERIALIZER', name)
+        items = [{'id': i, 'name': f'测试{i}'} for i in range(count)]
+        result = StreamingResult(iter(items), chunk_size=3)
+        assert result.is_streamed
+        assert result.status_code == 200
+        assert json.loads(result.get_data()) == \
+            SuccessResult(data=items).json
+
+    def test_streaming_result_lazy(self, app):
+        consumed = []
+
+        def gen():
+            for i in range(10):
+                consumed.append(i)
+                yield i
+
+        result = StreamingResult(
+            gen(), 'message', code=0, dump=str, chunk_size=4, status=201)
+        assert result.status_code == 201
+        chunks = iter(result.response)
+        assert next(chunks).startswith(b'{"code":"0","message":"message"')
+        assert consumed == []
+        assert next(chunks) == b'"0","1","2","3"'
+        assert consumed == [0, 1, 2, 3]
+        assert b''.join(chunks) == b',"4","5","6","7","8","9"]}\n'
+
+    def test_streaming_query(self, client):
+        db.session.add_all([
+            User(username=f'test{i}', email=f'{i}@b.com', password='1')
+            for i in range(5)])
+        db.session.commit()
+        resp = client.get('/stream_users/')
+        assert resp.status_code == 200
+        assert resp.json['data'] == [
+            {'username': f'test{i}'} for i in range(5)]
+
+
+class TestEnumOptionsResponse(BaseTest):
+
+    def test_enum_options_response(self, client):
+        resp = client.get('/options/')
+        assert resp.status_code == 200
+        assert resp.json == {'RoleEnum': [
+            {'key': 1, 'label': 'admin', 'value': '管理员'},
+            {'key': 2, 'label': 'normal', 'value': '普通用户'},
+        ]}
+        etag = resp.headers['ETag']
+
+        resp = client.get('/options/', headers={'If-None-Match': etag})
+        assert resp.status_code == 304
+        assert resp.data == b''
@@ -1,10 +1,21 @@
 # -*- encoding: utf-8 -*-
+import datetime
+import warnings
+
+import pytest
+from sqlalchemy import select
+from marshmallow import Schema, ValidationError, fields, post_dump
+from marshmallow.warnings import RemovedInMarshmallow4Warning
 from marshmallow_enum import EnumField
 
-from hobbit_core.schemas import ModelSchema
+from hobbit_core.schemas import (
+    ORMSchema, PagedSchema, ModelSchema, EnumExtField, compile_dump,
+    SchemaMixin, DateTimeField, DATETIME_FORMAT, format_datetime,
+    parse_datetime, get_schema,
+)
 
 from .test_app.exts import db
-from .test_app.models import User, RoleEnum
+from .test_app.models import User, RoleEnum, Post
 
 from . import BaseTest
 
@@ -51,3 +62,317 @@ class TestSchema(BaseTest):
                 'username': 'name',
             }
         db.session.commit()
+
+
+class TestEnumExtField(BaseTest):
+
+    def test_model_schema_without_hooks(self):
+        class UserSchema(ModelSchema):
+            role = EnumField(RoleEnum, data_key='user_role')
+
+            class Meta:
+                model = User
+                verbose = False
+
+        assert isinstance(UserSchema._declared_fields['role'], EnumExtField)
+        assert UserSchema._declared_fields['role'].data_key == 'user_role'
+        assert not hasattr(UserSchema, 'dump_role')
+        assert not hasattr(UserSchema, 'load_role')
+
+        user = User(username='name', email='admin@test', role=RoleEnum.admin)
+        assert UserSchema().dump(user)['user_role'] == {
+            'key': 1, 'value': '管理员'}
+
+        class VerboseUserSchema(UserSchema):
+            class Meta:
+                model = User
+
+        assert VerboseUserSchema().dump(user)['user_role'] == {
+            'key': 1, 'value': '管理员', 'label': 'admin'}
+
+    def test_enum_ext_field(self):
+        class RoleSchema(Schema):
+            role = EnumExtField(RoleEnum, allow_none=True)
+            roles = fields.List(EnumExtField(RoleEnum, verbose=False))
+
+        schema = RoleSchema()
+        data = schema.dump({'role': RoleEnum.normal, 'roles': [
+            RoleEnum.admin, 'normal']})
+        assert data == {
+            'role': {'key': 2, 'value': '普通用户', 'label': 'normal'},
+            'roles': [{'key': 1, 'value': '管理员'},
+                      {'key': 2, 'value': '普通用户'}],
+        }
+        data['role']['key'] = 3
+        assert schema.dump({'role': 'normal'})['role']['key'] == 2
+        assert schema.dump({'role': None}) == {'role': None}
+
+        payload = {'role': 'admin', 'roles': [2, '管理员']}
+        assert schema.load(payload) == {
+            'role': RoleEnum.admin, 'roles': [RoleEnum.normal, RoleEnum.admin]}
+        assert payload == {'role': 'admin', 'roles': [2, '管理员']}
+        assert schema.load({'role': None}) == {'role': None}
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', RemovedInMarshmallow4Warning)
+            for invalid in (3, 'unknown', [1], {'key': 1}):
+                with pytest.raises(ValidationError,
+                                   match='Invalid enum member'):
+                    schema.load({'role': invalid})
+
+
+class TestCompiledDump(BaseTest):
+
+    @pytest.fixture
+    def users(self):
+        created_at = datetime.datetime(2024, 1, 2, 3, 4, 5)
+        return [
+            User(id=1, username='a', email='a@test', password='1',
+                 role=RoleEnum.admin, created_at=created_at,
+                 updated_at=created_at),
+            User(id=2, username='b', email='b@test', role=None),
+        ]
+
+    def gen_schemas(self, compiled, **meta):
+        class UserSchema(ModelSchema):
+            role = EnumField(RoleEnum)
+            name = fields.Str(
+                attribute='username', data_key='nickname', dump_only=True)
+            posts = fields.Nested('PostSchema', many=True, only=['title'])
+            extra = fields.Str()
+            method = fields.Method('get_method')
+
+            Meta = type('Meta', (), dict(
+                model=User, include_relationships=True, compiled=compiled,
+                **meta))
+
+            def get_method(self, obj):
+                return type(obj).__name__
+
+        return UserSchema
+
+    def test_same_as_marshmallow(self, users):
+        users[0].posts = [Post(title='t')]
+        schema = self.gen_schemas(compiled=True)()
+        assert compile_dump(schema) is not None
+        expected = self.gen_schemas(compiled=False)().dump(users, many=True)
+        assert schema.dump(users, many=True) == expected
+        assert schema.dump(iter(users), many=True) == expected
+        assert schema.dump(users[0]) == expected[0]
+        assert list(schema.dump(users[0])) == list(expected[0])
+
+        assert expected[0]['created_at'] == '2024-01-02 03:04:05'
+        assert expected[0]['role'] == {
+            'key': 1, 'value': '管理员', 'label': 'admin'}
+        assert expected[0]['nickname'] == 'a'
+        assert expected[0]['method'] == 'User'
+        assert expected[0]['posts'] == [{'title': 't'}]
+        assert 'extra' not in expected[0]
+        assert expected[1]['role'] is None
+
+        schema = self.gen_schemas(compiled=True)(only=['id', 'role'])
+        assert schema.dump(users[1]) == {'id': 2, 'role': None}
+
+    def test_fallback(self, users):
+        UserSchema = self.gen_schemas(compiled=True)
+        schema = UserSchema()
+        data = {'username': 'c', 'created_at': users[0].created_at}
+        assert schema.dump(data) == {
+            'nickname': 'c', 'username': 'c', 'created_at':
+            '2024-01-02 03:04:05', 'method': 'dict'}
+        assert schema.dump([users[0], data], many=True)[1] == \
+            schema.dump(data)
+
+        class HookedUserSchema(UserSchema):
+            @post_dump
+            def add_hook(self, data, **kwargs):
+                data['hooked'] = True
+                return data
+
+        assert compile_dump(HookedUserSchema()) is None
+        assert HookedUserSchema().dump(users[0])['hooked'] is True
+
+        assert compile_dump(self.gen_schemas(True, ordered=True)()) is None
+        assert self.gen_schemas(compiled=False)()._get_compiled_dump() is None
+
+
+class TestDateTimeField(BaseTest):
+
+    class SubDateTime(datetime.datetime):
+        pass
+
+    @pytest.mark.parametrize('value', [
+        datetime.datetime(2024, 1, 2, 3, 4, 5),
+        datetime.datetime(2024, 12, 31, 23, 59, 59, 999999),
+        datetime.datetime(1, 1, 1),
+        datetime.datetime(999, 9, 9, 9, 9, 9),
+        datetime.datetime(1000, 1, 1),
+        datetime.datetime(9999, 12, 31, 23, 59, 59),
+        datetime.datetime(2024, 1, 2, 3, 4, 5, 6, datetime.timezone(
+            datetime.timedelta(hours=8))),
+        datetime.date(2024, 1, 2),
+        SubDateTime(2024, 1, 2, 3, 4, 5),
+    ])
+    def test_format_datetime(self, value):
+        assert format_datetime(value) == value.strftime(DATETIME_FORMAT)
+
+    @pytest.mark.parametrize('value', [
+        '2024-01-02 03:04:05', '0001-01-01 00:00:00', '9999-12-31 23:59:59',
+        '2024-1-2 3:4:5', '2024-01-02 03:04:5', '2024-01-02 03:04:05Z',
+        '2024-01-02T03:04:05', '2024-13-02 03:04:05', '2024-02-30 03:04:05',
+        '2024-01-02 24:00:00', '２０２４-01-02 03:04:05', '+024-01-02 03:04:05',
+        '2024-01-02 03:04:0.', '2024-01-02', '', ' 2024-01-02 03:04:05',
+    ])
+    def test_parse_datetime(self, value):
+        try:
+            expected = datetime.datetime.strptime(value, DATETIME_FORMAT)
+        except ValueError:
+            with pytest.raises(ValueError):
+                parse_datetime(value)
+        else:
+            assert parse_datetime(value) == expected
+
+    def test_datetime_field(self):
+        class UserSchema(Schema, SchemaMixin):
+            last_login = DateTimeField(allow_none=True)
+            iso = DateTimeField('iso')
+
+        assert isinstance(UserSchema._declared_fields['created_at'],
+                          DateTimeField)
+        value = datetime.datetime(2024, 1, 2, 3, 4, 5)
+        schema = UserSchema()
+        assert schema.dump({
+            'created_at': value, 'last_login': None, 'iso': value,
+        }) == {
+            'created_at': '2024-01-02 03:04:05', 'last_login': None,
+            'iso': '2024-01-02T03:04:05',
+        }
+        assert schema.load({'last_login': '2024-01-02 03:04:05'}) == {
+            'last_login': value}
+        for invalid in ('2024-01-02T03:04:05', '2024-13-01 00:00:00', 1):
+            with pytest.raises(ValidationError, match='Not a valid datetime'):
+                schema.load({'last_login': invalid})
+
+
+class PoolUserSchema(ORMSchema, SchemaMixin):
+    class Meta:
+        model = User
+
+
+class PoolPostSchema(ORMSchema, SchemaMixin):
+    user = fields.Nested('PoolUserSchema', only=['id', 'username'])
+
+    class Meta:
+        model = Post
+        exclude = ['content']
+
+
+class PoolPagedPostSchema(PagedSchema):
+    items = fields.Nested(PoolPostSchema, many=True)
+
+
+class TestGetSchema(BaseTest):
+
+    def test_pool(self):
+        schema = get_schema(PoolUserSchema, only=['id', 'username'])
+        assert get_schema('PoolUserSchema', only=('username', 'id')) is \
+            schema
+        assert schema.only == {'id', 'username'}
+        assert get_schema(PoolUserSchema) is not schema
+        assert get_schema(PoolUserSchema, many=True) is not \
+            get_schema(PoolUserSchema)
+        assert get_schema(PoolUserSchema, many=True).many is True
+
+    def test_nested(self):
+        schema = get_schema(PoolPagedPostSchema)
+        items = schema.fields['items']._schema
+        assert items is get_schema(PoolPostSchema, many=True)
+        assert items.fields['user']._schema is get_schema(
+            PoolUserSchema, only=['id', 'username'])
+
+        post = Post(id=1, title='t', user_id=2, user=User(
+            id=2, username='u', email='e', password='p'))
+        data = {'items': [post], 'total': 1, 'page': 1, 'page_size': 10}
+        assert schema.dump(data) == PoolPagedPostSchema().dump(data)
+        assert schema.dump(data)['items'][0]['user'] == {
+            'id': 2, 'username': 'u'}
+
+    def test_nested_self(self):
+        class NodeSchema(Schema):
+            name = fields.Str()
+            children = fields.List(fields.Nested('self', exclude=['parent']))
+            parent = fields.Nested('self', only=['name'])
+
+        schema = get_schema(NodeSchema)
+        children = schema.fields['children'].inner._schema
+        assert children is get_schema(NodeSchema, many=False,
+                                      exclude=['parent'])
+        assert children.fields['children'].inner._schema is children
+        assert schema.fields['parent']._schema.only == {'name'}
+
+        tree = {'name': 'a', 'parent': {'name': 'root', 'children': []},
+                'children': [{'name': 'b', 'children': [{'name': 'c'}]}]}
+        assert schema.dump(tree) == NodeSchema().dump(tree)
+
+
+class TestDumpRows(BaseTest):
+
+    @pytest.fixture
+    def users(self):
+        created_at = datetime.datetime(2024, 1, 2, 3, 4, 5)
+        users = [User(username=f'u{i}', email=f'{i}@test', password='p',
+                      role=RoleEnum.normal if i else None,
+                      created_at=created_at, updated_at=created_at)
+                 for i in range(3)]
+        db.session.add_all(users)
+        db.session.commit()
+        return User.query.order_by(User.id).all()
+
+    class RowUserSchema(ModelSchema):
+        role = EnumField(RoleEnum)
+        name = fields.Str(attribute='username', data_key='nickname',
+                          dump_only=True)
+        label = fields.Function(lambda obj: f'{obj.id}-{obj.username}')
+
+        class Meta:
+            model = User
+            verbose = False
+
+    def test_dump_rows(self, users):
+        schema = self.RowUserSchema()
+        columns = schema.row_columns()
+        assert User.username in columns and User.role in columns
+        rows = db.session.execute(
+            select(*columns).order_by(User.id)).all()
+        expected = schema.dump(users, many=True)
+        assert schema.dump_rows(rows) == expected
+        assert schema.dump_rows(iter(rows)) == expected
+        assert expected[1]['role'] == {'key': 2, 'value': '普通用户'}
+        assert expected[0]['created_at'] == '2024-01-02 03:04:05'
+        assert expected[0]['label'] == f'{users[0].id}-u0'
+        assert schema.dump_rows([]) == []
+
+        rows = db.session.execute(
+            select(*reversed(columns)).order_by(User.id)).all()
+        assert schema.dump_rows(rows) == expected
+
+        schema = PoolUserSchema(exclude=['password'])
+        rows = db.session.execute(
+            select(*schema.row_columns()).order_by(User.id)).all()
+        assert schema.dump_rows(rows) == schema.dump(users, many=True)
+
+    def test_not_support(self, users):
+        schema = self.RowUserSchema()
+        rows = db.session.execute(select(User.id, User.username)).all()
+        with pytest.raises(Exception, match='not support dump rows'):
+            schema.dump_rows(rows)
+
+        class HookedSchema(self.RowUserSchema):
+            @post_dump
+            def add_hook(self, data, **kwargs):
+                return data
+
+        schema = HookedSchema()
+        rows = db.session.execute(select(*schema.row_columns())).all()
+        with pytest.raises(Exception, match='not support dump rows'):
+            schema.dump_rows(rows)
@@ -1,13 +1,19 @@
+import datetime
 import pytest
 from importlib import reload
 import random
 import string
 
+import sqlalchemy as sa
+from marshmallow import fields
+
 from hobbit_core import utils
+from hobbit_core.webargs import strip_whitespace
 
 from .test_app.exts import db
-from .test_app.models import BulkModel, BulkModel2, \
-    BulkModelMysql, BulkModel2Mysql
+from .test_app.schemas import UserSchema
+from .test_app.models import RoleEnum, BulkModel, BulkModel2, \
+    BulkModelMysql, BulkModel2Mysql, BulkModelSqlite, BulkModel2Sqlite
 
 from . import BaseTest
 
@@ -94,11 +100,102 @@ class TestUseKwargs(BaseTest):
         resp = client.post('/base_use_kwargs_dictargmap_partial/', json={})
         assert resp.json == {'username': None}
 
+    def test_use_kwargs_with_partial_single_pass(self, app):
+        inits, loads = [], []
+
+        class CountedUserSchema(UserSchema):
+            def __init__(self, *args, **kwargs):
+                inits.append(kwargs.get('only'))
+                super().__init__(*args, **kwargs)
+
+            def load(self, data, **kwargs):
+                loads.append(data)
+                return super().load(data, **kwargs)
+
+        @utils.use_kwargs(CountedUserSchema(partial=True, exclude=['role']))
+        def viewfunc(**kwargs):
+            return kwargs
+
+        # schemas are built when decorating
+        assert len(inits) == 3
+
+        for payload in ({'username': 'a'}, {'username': 'b'}, {'email': 'c'},
+                        {'username': 'd'}):
+            with app.test_request_context(method='POST', json=payload):
+                assert viewfunc() == payload
+        assert len(inits) == 3
+        assert len(loads) == 4
+
+    def test_use_kwargs_with_partial_nested_required(self, app):
+        from marshmallow import Schema
+
+        class AddrSchema(Schema):
+            city = fields.Str(required=True)
+            zip = fields.Str()
+
+        class PartialSchema(Schema):
+            name = fields.Str(required=True)
+            addr = fields.Nested(AddrSchema)
+
+        @utils.use_kwargs(PartialSchema(partial=True))
+        def viewfunc(**kwargs):
+            return kwargs
+
+        with app.test_request_context(
+                method='POST', json={'addr': {'zip': '1'}}):
+            with pytest.raises(Exception) as excinfo:
+                viewfunc()
+        assert excinfo.value.code == 422
+        assert excinfo.value.data['messages'] == {'json': {
+            'addr': {'city': ['Missing data for required field.']}}}
+
+        payload = {'addr': {'city': 'c', 'zip': '1'}}
+        with app.test_request_context(method='POST', json=payload):
+            assert viewfunc() == payload
+
     def test_auto_trim(self, client):
         payload = {'username': '  username', 'email': ' email  '}
         resp = client.post('/use_kwargs_with_partial/', json=payload)
         assert resp.json == {'username': 'username', 'email': 'email'}
 
+    def test_auto_trim_opt_out(self, app):
+        @utils.use_kwargs({
+            'username': fields.Str(),
+            'password': fields.Str(metadata={'strip_whitespace': False}),
+            'token': fields.Str(data_key='X-Token', load_default=None),
+        })
+        def viewfunc(**kwargs):
+            return kwargs
+
+        @utils.use_kwargs({'token': fields.Str(data_key='X-Token')},
+                          location='headers')
+        def headers_viewfunc(**kwargs):
+            return kwargs
+
+        payload = {'username': ' a ', 'password': ' p '}
+        with app.test_request_context(
+                method='POST', json=payload, headers={'X-Token': ' t '}):
+            assert viewfunc() == {
+                'username': 'a', 'password': ' p ', 'token': None}
+            assert headers_viewfunc() == {'token': ' t '}
+
+    def test_strip_whitespace(self):
+        data = {'a': {'b': ['c']}, 'd': [1, {'e': None}], 'f': 'g'}
+        assert strip_whitespace(data) is data
+
+        data = {'a': {'b': [' c ']}, 'd': {'e': 'e'}, 'f': {' g'},
+                'h': (' h', )}
+        stripped = strip_whitespace(data)
+        assert stripped == {'a': {'b': ['c']}, 'd': {'e': 'e'}, 'f': {'g'},
+                            'h': (' h', )}
+        assert stripped['d'] is data['d']
+        assert data['a']['b'] == [' c ']
+
+        assert strip_whitespace({'a': ' a ', 'b': [' b ']}, exclude={'b'}) \
+            == {'a': 'a', 'b': [' b ']}
+        assert strip_whitespace([' a', [' b ']]) == ['a', ['b']]
+        assert strip_whitespace(' a ') == 'a'
+
 
 class TestImportSubs(BaseTest):
 
@@ -146,6 +243,8 @@ class TestBulkInsertOrUpdate(BaseTest):
             (BulkModel2, 'update'),
             (BulkModelMysql, None),
             (BulkModel2Mysql, 'update'),
+            (BulkModelSqlite, None),
+            (BulkModel2Sqlite, 'update'),
         ])
     def test_bulk_create_or_update_on_duplicate(
             self, item_length, model_cls, updated_at_field_name):
@@ -171,3 +270,241 @@ class TestBulkInsertOrUpdate(BaseTest):
 
         assert db.session.query(model_cls).count() == item_length
         db.session.commit()
+
+    @pytest.mark.parametrize('model_cls', [
+        BulkModel, BulkModelMysql, BulkModelSqlite])
+    def test_bulk_create_or_update_on_duplicate_with_generator(
+            self, model_cls):
+        items = [{'x': str(i), 'y': 'y', 'z': 'z'} for i in range(11)]
+        progress = []
+
+        result = utils.bulk_create_or_update_on_duplicate(
+            db, model_cls, (item for item in items), batch_size=5,
+            progress_callback=progress.append)
+        assert result == {'rowcount': 11, 'items_count': 11}
+        assert [(p['batch'], p['batch_size'], p['items_count'])
+                for p in progress] == [(1, 5, 5), (2, 5, 10), (3, 1, 11)]
+        # input items are not mutated
+        assert all('updated_at' not in item for item in items)
+
+        assert db.session.query(model_cls).count() == 11
+        db.session.commit()
+
+    @pytest.mark.parametrize('model_cls', [BulkModel, BulkModelMysql])
+    def test_bulk_create_or_update_on_duplicate_with_workers(self, model_cls):
+        items = [{'x': str(i), 'y': 'y', 'z': 'z'} for i in range(101)]
+        progress = []
+
+        for _ in range(2):
+            result = utils.bulk_create_or_update_on_duplicate(
+                db, model_cls, iter(items), batch_size=10, workers=4,
+                max_in_flight=2, progress_callback=progress.append)
+            assert result == {'rowcount': 101, 'items_count': 101}
+        assert progress[-1]['items_count'] == 101
+        assert sum(p['batch_size'] for p in progress) == 202
+
+        assert db.session.query(model_cls).count() == 101
+        db.session.commit()
+
+    @pytest.mark.parametrize('workers', [None, 2])
+    @pytest.mark.parametrize('model_cls', [
+        BulkModel, BulkModel2, BulkModelMysql, BulkModelSqlite])
+    def test_bulk_create_or_update_on_duplicate_repeated_keys(
+            self, model_cls, workers):
+        items = [{'x': str(i % 3), 'y': 'y', 'z': 'z'} for i in range(7)]
+        if model_cls is BulkModel2:
+            for i, item in enumerate(items):
+                item['update'] = datetime.datetime(2024, 1, 1, 0, 0, i)
+
+        result = utils.bulk_create_or_update_on_duplicate(
+            db, model_cls, items, batch_size=10, workers=workers,
+            updated_at='update' if model_cls is BulkModel2 else 'updated_at')
+        assert result['items_count'] == 7
+
+        # postgreSQL rejects a multi-row upsert which affects a row twice
+        rows = [{'x': '0', 'v': 1}, {'x': '1', 'v': 2}, {'x': '0', 'v': 3}]
+        assert utils._dedupe_by_unique_keys(rows, ['x']) == [
+            {'x': '0', 'v': 3}, {'x': '1', 'v': 2}]
+        assert utils._dedupe_by_unique_keys(rows[:2], ['x']) == rows[:2]
+
+        assert db.session.query(model_cls).count() == 3
+        if model_cls is BulkModel2:
+            assert sorted(
+                (row.x, row.update.second)
+                for row in db.session.query(model_cls)
+            ) == [('0', 6), ('1', 4), ('2', 5)]
+        db.session.commit()
+
+    @pytest.mark.parametrize('model_cls', [
+        BulkModel, BulkModelMysql, BulkModelSqlite])
+    def test_bulk_create_or_update_on_duplicate_auto_batch_size(
+            self, model_cls, monkeypatch):
+        engine = db.get_engine(bind_key=getattr(
+            model_cls, '__bind_key__', None))
+        # 4 fields: x, y, z, updated_at
+        monkeypatch.setitem(utils.BIND_PARAMS_LIMITS, engine.name, 20)
+        items = [{'x': str(i), 'y': 'y', 'z': 'z'} for i in range(23)]
+        progress = []
+
+        result = utils.bulk_create_or_update_on_duplicate(
+            db, model_cls, items, batch_size='auto',
+            progress_callback=progress.append)
+        assert result == {'rowcount': 23, 'items_count': 23}
+        assert max(p['batch_size'] for p in progress) == 5
+
+        assert db.session.query(model_cls).count() == 23
+        db.session.commit()
+
+    def test_adaptive_batch_size_observe(self):
+        batch_size = utils._AdaptiveBatchSize(
+            ceiling=5000, initial=500, target_seconds=0.5)
+        assert batch_size() == 500
+        assert utils._AdaptiveBatchSize(ceiling=100)() == 100
+
+        # fast batches: 10ms per 500 rows grows to the ceiling
+        sizes = []
+        for _ in range(5):
+            batch_size.observe(batch_size(), 0.01 * batch_size() / 500)
+            sizes.append(batch_size())
+        assert sizes == sorted(sizes) and sizes[0] > 500
+        assert sizes[-1] == 5000
+
+        # slow batches: 1ms per row moves back toward 500 rows (0.5s)
+        sizes = []
+        for _ in range(10):
+            batch_size.observe(batch_size(), 0.001 * batch_size())
+            sizes.append(batch_size())
+        assert sizes == sorted(sizes, reverse=True) and sizes[0] < 5000
+        assert 500 <= sizes[-1] < 510
+
+        # very slow batches never go below 1 row
+        for _ in range(20):
+            batch_size.observe(batch_size(), 100.0 * batch_size())
+        assert batch_size() == 1
+
+        # empty or unmeasured batches are ignored
+        batch_size.observe(0, 1.0)
+        batch_size.observe(10, 0)
+        assert batch_size() == 1
+
+    def test_bulk_create_or_update_on_duplicate_not_support_db(self):
+        engine = db.get_engine(bind_key='sqlite')
+        builder = utils.UPSERT_STATEMENT_BUILDERS.pop('sqlite')
+        utils.bulk_create_or_update_on_duplicate.cache_clear()
+        try:
+            with pytest.raises(Exception, match='not support db: sqlite'):
+                utils.bulk_create_or_update_on_duplicate(
+                    db, BulkModelSqlite, [{'x': 'x', 'y': 'y', 'z': 'z'}])
+        finally:
+            utils.UPSERT_STATEMENT_BUILDERS['sqlite'] = builder
+        assert engine.name == 'sqlite'
+
+    def test_bulk_create_or_update_on_duplicate_statement_cache(self):
+        utils.bulk_create_or_update_on_duplicate.cache_clear()
+        items = [{'x': 'x', 'y': 'y', 'z': 'z'}]
+
+        for _ in range(3):
+            utils.bulk_create_or_update_on_duplicate(db, BulkModel, items)
+        cache_info = utils.bulk_create_or_update_on_duplicate.cache_info()
+        assert (cache_info.hits, cache_info.misses) == (2, 1)
+
+        # fields order does not matter
+        utils.bulk_create_or_update_on_duplicate(
+            db, BulkModel, [{'z': 'z', 'y': 'y', 'x': 'x'}])
+        cache_info = utils.bulk_create_or_update_on_duplicate.cache_info()
+        assert (cache_info.hits, cache_info.misses) == (3, 1)
+        db.session.commit()
+
+    @pytest.mark.parametrize('model_cls, updated_at_field_name', [
+        (BulkModel, 'updated_at'),
+        (BulkModel2, 'update'),
+        (BulkModelMysql, 'updated_at'),
+        (BulkModel2Mysql, 'update'),
+        (BulkModelSqlite, 'updated_at'),
+    ])
+    def test_bulk_create_or_update_on_duplicate_use_copy(
+            self, model_cls, updated_at_field_name):
+        items = [{'x': f'x\t{i}', 'y': 'y\\', 'z': 'z\n'} for i in range(11)]
+        progress = []
+
+        for _ in range(2):
+            result = utils.bulk_create_or_update_on_duplicate(
+                db, model_cls, iter(items), updated_at=updated_at_field_name,
+                batch_size=5, use_copy=True, progress_callback=progress.append)
+            assert result['items_count'] == 11 and result['rowcount'] > 0
+        assert [p['items_count'] for p in progress] == [5, 10, 11] * 2
+
+        assert db.session.query(model_cls).count() == 11
+        assert {(i.x, i.y, i.z) for i in db.session.query(model_cls)} == {
+            (i['x'], i['y'], i['z']) for i in items}
+        db.session.commit()
+
+    @pytest.mark.parametrize('options', [
+        {'workers': 2}, {'max_in_flight': 4},
+        {'workers': 2, 'max_in_flight': 4}])
+    def test_bulk_create_or_update_on_duplicate_use_copy_serial(
+            self, options):
+        with pytest.raises(ValueError, match='use_copy'):
+            utils.bulk_create_or_update_on_duplicate(
+                db, BulkModel, [{'x': '1', 'y': '1', 'z': '1'}],
+                use_copy=True, **options)
+
+    def test_copy_line_encoders(self):
+        metadata = sa.MetaData()
+
+        class CopyModel:
+            __tablename__ = 'copy_model'
+            __table_args__ = (sa.UniqueConstraint('name'), )
+            __table__ = sa.Table(
+                'copy_model', metadata,
+                sa.Column('name', sa.String(10)),
+                sa.Column('data', sa.JSON),
+                sa.Column('nullable_data', sa.JSON(none_as_null=True)),
+                sa.Column('blob', sa.LargeBinary),
+                sa.Column('role', sa.Enum(RoleEnum)),
+                sa.Column('active', sa.Boolean))
+
+        fields = ('name', 'data', 'nullable_data', 'blob', 'role', 'active')
+        row = {'name': 'a\tb', 'data': {'k': [1, 'x\n']},
+               'nullable_data': None, 'blob': b'\x00ab',
+               'role': RoleEnum.admin, 'active': True}
+        encoders = utils._get_copy_encoders(CopyModel, fields, 'postgresql')
+        assert utils._copy_line(row, fields, encoders) == \
+            'a\\tb\t{"k": [1, "x\\\\n"]}\t\\N\t\\\\x006162\tadmin\t1\n'
+        row.update(data=None, blob=None)
+        assert utils._copy_line(row, fields, encoders).split('\t')[1:4] == [
+            'null', '\\N', '\\N']
+
+        encoders = utils._get_copy_encoders(CopyModel, fields, 'mysql')
+        row['blob'] = b'\x00ab'
+        assert utils._copy_line(row, fields, encoders).split('\t')[3] == \
+            '006162'
+        load = str(utils._build_copy_statements(
+            CopyModel, fields, 'mysql')['load'])
+        assert '(`name`, `data`, `nullable_data`, @blob, `role`, `active`)' \
+            ' SET `blob` = UNHEX(@blob)' in load
+
+        with pytest.raises(Exception, match='not support copy value type'):
+            utils._copy_line(dict(row, name=['a']), fields, encoders)
+
+    def test_copy_mysql_staging_cleanup(self, monkeypatch):
+        executed = []
+
+        class Conn:
+            def execute(self, stmt, *args):
+                executed.append(str(stmt).split(' _hobbit')[0])
+
+        db_ = type('DB', (), {'session': type('Session', (), {
+            'connection': lambda self, **kwargs: Conn()})()})()
+        engine = type('Engine', (), {'name': 'mysql'})()
+
+        def load(*args):
+            raise ValueError('load failed')
+
+        monkeypatch.setitem(utils._COPY_LOADERS, 'mysql', load)
+        with pytest.raises(ValueError, match='load failed'):
+            utils._bulk_copy_upsert(
+                db_, engine, BulkModelMysql, ('x', 'y', 'z'), [], None)
+        assert executed == [
+            'DROP TEMPORARY TABLE IF EXISTS', 'CREATE TEMPORARY TABLE',
+            'DROP TEMPORARY TABLE IF EXISTS']